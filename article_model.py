@@ -0,0 +1,231 @@
+"""
+Компактная модель статьи Dzen News Scraper
+Запись со слотами вместо словарей, интернирование повторяющихся строк,
+ленивая загрузка текста и потоковая сериализация без промежуточных копий
+"""
+
+import json
+import mmap
+import re
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from url_canonicalizer import strip_tracking_params
+
+
+class Article:
+    """Статья: карточка новости и, после загрузки, ее полный текст"""
+
+    # Поля, которые всегда есть в JSON результатов (как в словарях статей до Article);
+    # остальные сохраняются, только если заданы
+    REQUIRED_FIELDS = ('title', 'url', 'summary', 'scraped_at', 'content', 'publish_date', 'content_length')
+    # Порядок полей при сериализации
+    FIELDS = (
+        'title', 'url', 'summary', 'scraped_at', 'card_id', 'published_at', 'source',
+        'rubric', 'carried_over_at', 'content', 'publish_date', 'content_length'
+    )
+    # Строки, которые повторяются между статьями
+    INTERNED = ('source', 'rubric', 'publish_date', 'published_at', 'domain')
+
+    __slots__ = (
+        'title', 'url', 'summary', 'scraped_at', 'card_id', 'published_at', 'source', 'rubric',
+        'carried_over_at', 'publish_date', 'content_length', 'domain', '_url_key', '_content',
+        '_content_loader'
+    )
+
+    def __init__(self, title: str = '', url: str = '', summary: str = '', scraped_at: str = '',
+                 card_id: str = '', published_at: str = '', source: str = '', rubric: str = '',
+                 carried_over_at: str = '', content: Optional[str] = None, publish_date: str = '',
+                 content_length: int = 0, content_loader: Optional[Callable[[], str]] = None):
+        # Интернирование и домен выполняются в __setattr__
+        self.title = title
+        self.url = url
+        self.summary = summary
+        self.scraped_at = scraped_at
+        self.card_id = card_id
+        self.published_at = published_at
+        self.source = source
+        self.rubric = rubric
+        self.carried_over_at = carried_over_at
+        self.publish_date = publish_date
+        self.content_length = content_length
+        self._content = content
+        self._content_loader = content_loader
+
+    @property
+    def content(self) -> str:
+        """Текст статьи; загружается при первом обращении, если задан загрузчик"""
+        if self._content is None and self._content_loader is not None:
+            self._content = self._content_loader()
+            self._content_loader = None
+        return self._content or ''
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+        self._content_loader = None
+
+    @property
+    def url_key(self) -> str:
+        """Ключ статьи для поиска дублей, истории загрузок и guid: URL без параметров отслеживания"""
+        if self._url_key is None:
+            self._url_key = strip_tracking_params(self.url)
+        return self._url_key
+
+    @classmethod
+    def from_dict(cls, data: Dict, content_loader: Optional[Callable[[], str]] = None) -> 'Article':
+        """Создание статьи из словаря (например, из JSON-файла результатов)"""
+        article = cls(content_loader=content_loader)
+        article.update(data)
+        return article
+
+    def update(self, data: Dict):
+        """Обновление полей из словаря; неизвестные ключи игнорируются"""
+        for key, value in data.items():
+            if key in self.FIELDS and value is not None:
+                setattr(self, key, value)
+
+    def merge(self, other: 'Article'):
+        """Заполнение полей непустыми значениями другой записи той же статьи"""
+        for key in self.FIELDS:
+            if key == 'content':
+                continue
+            value = getattr(other, key)
+            if value:
+                setattr(self, key, value)
+
+    def copy(self, **changes) -> 'Article':
+        """Поверхностная копия: строки не копируются, а разделяются"""
+        article = Article.__new__(Article)
+        for key in self.__slots__:
+            setattr(article, key, getattr(self, key))
+        for key, value in changes.items():
+            setattr(article, key, value)
+        return article
+
+    def __setattr__(self, key, value):
+        if key in Article.INTERNED and isinstance(value, str) and value:
+            value = sys.intern(value)
+        if key == 'url' and isinstance(value, str):
+            object.__setattr__(self, 'domain', sys.intern(urlparse(value).netloc) if value else '')
+            object.__setattr__(self, '_url_key', None)
+        object.__setattr__(self, key, value)
+
+    # Доступ как к словарю для экспортеров и старого кода
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value in ('', None) and default is not None else value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def iter_fields(self, with_content: bool = True) -> Iterator:
+        """Поля в порядке сериализации: обязательные всегда, дополнительные - если заданы"""
+        for key in self.FIELDS:
+            if key == 'content' and not with_content:
+                continue
+            value = self.content if key == 'content' else getattr(self, key)
+            if value or key in self.REQUIRED_FIELDS:
+                yield key, value
+
+    def to_dict(self) -> Dict:
+        return dict(self.iter_fields())
+
+    def __repr__(self) -> str:
+        return f"Article({self.url!r})"
+
+
+def iter_json(articles: Iterable[Article]) -> Iterator[str]:
+    """Потоковая сериализация списка статей в JSON частями (по статье)"""
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    first = True
+    yield '['
+    for article in articles:
+        fields = ',\n'.join(f'    {dumps(key)}: {dumps(value)}' for key, value in article.iter_fields())
+        yield ('\n  {\n' if first else ',\n  {\n') + fields + '\n  }'
+        first = False
+    yield '\n]' if not first else ']'
+
+
+# Строка JSON целиком или скобка: строки пропускаются одним совпадением, без разбора
+TOKEN_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]', re.DOTALL)
+OPEN_BRACKETS = (ord('{'), ord('['))
+
+
+def _object_spans(buffer) -> Iterator[Tuple[int, int]]:
+    """Байтовые границы объектов верхнего уровня: элементов массива или единственного объекта"""
+    depth = 0
+    top = None
+    start = 0
+    for match in TOKEN_RE.finditer(buffer):
+        position = match.start()
+        char = buffer[position]
+        if char == ord('"'):
+            continue
+        if top is None:
+            top = 1 if char == ord('[') else 0
+        if char in OPEN_BRACKETS:
+            if char == ord('{') and depth == top:
+                start = position
+            depth += 1
+        else:
+            depth -= 1
+            if char == ord('}') and depth == top:
+                yield start, match.end()
+
+
+def _map_file(f):
+    """Файл в памяти через mmap (страницы читаются по мере обращения); None для пустого файла"""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        return None
+
+
+def count_articles(file_path) -> int:
+    """Количество статей в файле результатов без разбора их содержимого"""
+    with open(file_path, 'rb') as f:
+        buffer = _map_file(f)
+        if buffer is None:
+            return 0
+        with buffer:
+            return sum(1 for _ in _object_spans(buffer))
+
+
+def load_articles(file_path, with_content: bool = True) -> List[Article]:
+    """Чтение файла результатов; без with_content текст подгружается только при обращении
+
+    Файл разбирается по одной статье: в памяти не бывает всего дерева JSON сразу,
+    а для ленивого текста запоминаются байтовые границы записи в файле.
+    """
+    articles = []
+    with open(file_path, 'rb') as f:
+        buffer = _map_file(f)
+        if buffer is None:
+            return articles
+        with buffer:
+            for start, end in _object_spans(buffer):
+                item = json.loads(buffer[start:end])
+                if with_content:
+                    articles.append(Article.from_dict(item))
+                else:
+                    item.pop('content', None)
+                    articles.append(Article.from_dict(item, content_loader=_file_content_loader(file_path, start, end)))
+    return articles
+
+
+def _file_content_loader(file_path, start: int, end: int) -> Callable[[], str]:
+    def load() -> str:
+        # Читается только запись этой статьи
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start)).get('content', '')
+    return load
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Замер времени запуска модулей Dzen News Scraper
+Импортирует каждый модуль в чистом процессе с python -X importtime и выводит
+время импорта, самые медленные зависимости и пиковую память
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+ADMIN_DIR = ROOT_DIR / 'temp'
+
+DEFAULT_MODULES = ['dzen_scraper', 'job_queue', 'scheduler', 'admin_app']
+# Модули, которые не должны загружаться при импорте: браузерный стек нужен только скраперу в работе
+DEFAULT_FORBIDDEN = ['playwright']
+
+CHILD_SCRIPT = """
+import resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ' '.join(sorted(sys.modules)))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Строки отчета -X importtime: собственное и накопленное время импорта (мкс)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            entries.append({'module': name.strip(), 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+        except ValueError:
+            continue
+    return entries
+
+
+def measure_once(module: str, forbidden: List[str], workdir: str) -> Dict:
+    """Импорт модуля в отдельном процессе"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(ROOT_DIR), str(ADMIN_DIR), env.get('PYTHONPATH')]))
+    # Без байткода на диске замер зависел бы от того, запускался ли модуль раньше
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT.format(module=module)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ['неизвестная ошибка'])[-1]
+        return {'error': error}
+
+    import_seconds, max_rss_kb, loaded = result.stdout.strip().splitlines()[-1].split(' ', 2)
+    loaded_modules = set(loaded.split())
+    entries = parse_importtime(result.stderr)
+    total = next((entry['cumulative_us'] for entry in entries if entry['module'] == module), 0)
+    return {
+        'wall_ms': wall * 1000,
+        'import_ms': float(import_seconds) * 1000,
+        'importtime_ms': total / 1000,
+        'max_rss_mb': int(max_rss_kb) / 1024,
+        'modules': len(loaded_modules),
+        'forbidden': sorted(name for name in forbidden if name in loaded_modules),
+        'entries': entries
+    }
+
+
+def measure(module: str, repeat: int, forbidden: List[str], top: int) -> Dict:
+    """Медианы по нескольким запускам и самые медленные зависимости"""
+    # Пустой рабочий каталог: видно, если импорт создает файлы (логи, каталоги)
+    with tempfile.TemporaryDirectory(prefix='dzen_imports_') as workdir:
+        runs = [measure_once(module, forbidden, workdir) for _ in range(repeat)]
+        created = sorted(os.listdir(workdir))
+
+    errors = [run['error'] for run in runs if 'error' in run]
+    if errors:
+        return {'module': module, 'error': errors[0]}
+
+    slowest: Dict[str, int] = {}
+    for run in runs:
+        for entry in run['entries']:
+            slowest[entry['module']] = max(slowest.get(entry['module'], 0), entry['self_us'])
+
+    return {
+        'module': module,
+        'wall_ms': round(statistics.median(run['wall_ms'] for run in runs), 1),
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 1),
+        'importtime_ms': round(statistics.median(run['importtime_ms'] for run in runs), 1),
+        'max_rss_mb': round(max(run['max_rss_mb'] for run in runs), 1),
+        'modules': runs[0]['modules'],
+        'forbidden': runs[0]['forbidden'],
+        'created_files': created,
+        'slowest': [
+            {'module': name, 'self_ms': round(self_us / 1000, 2)}
+            for name, self_us in sorted(slowest.items(), key=lambda item: -item[1])[:top]
+        ]
+    }
+
+
+def print_report(results: List[Dict], previous: Optional[Dict] = None):
+    """Вывод результатов с разницей относительно предыдущего прогона"""
+    previous_by_module = {item['module']: item for item in (previous or {}).get('results', [])}
+
+    print(f"\n{'Модуль':<14}{'запуск':>9}{'импорт':>9}{'RSS, МБ':>9}{'модулей':>9}")
+    for item in results:
+        if 'error' in item:
+            print(f"{item['module']:<14}  ошибка: {item['error']}")
+            continue
+        print(
+            f"{item['module']:<14}{item['wall_ms']:>9}{item['import_ms']:>9}"
+            f"{item['max_rss_mb']:>9}{item['modules']:>9}"
+        )
+
+        before = previous_by_module.get(item['module'])
+        if before and 'error' not in before:
+            delta_wall = item['wall_ms'] - before['wall_ms']
+            delta_rss = item['max_rss_mb'] - before['max_rss_mb']
+            print(f"{'':<14}  изменение: запуск {delta_wall:+.1f} мс, RSS {delta_rss:+.1f} МБ")
+
+        slowest = ', '.join(f"{entry['module']} {entry['self_ms']}" for entry in item['slowest'])
+        print(f"{'':<14}  медленные импорты (мс): {slowest}")
+        if item['forbidden']:
+            print(f"{'':<14}  загружены при импорте: {', '.join(item['forbidden'])}")
+        if item['created_files']:
+            print(f"{'':<14}  созданы при импорте: {', '.join(item['created_files'])}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Замер времени импорта модулей")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=5, help="Запусков на модуль (берется медиана)")
+    parser.add_argument('--top', type=int, default=5, help="Сколько самых медленных импортов показать")
+    parser.add_argument('--forbid', nargs='*', default=DEFAULT_FORBIDDEN,
+                        help="Модули, загрузка которых при импорте считается ошибкой")
+    parser.add_argument('--output', help="Сохранить результаты в JSON")
+    parser.add_argument('--compare', help="Сравнить с результатами предыдущего прогона")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = []
+    for module in args.modules:
+        print(f"Импорт {module}: {args.repeat} запусков...")
+        results.append(measure(module, args.repeat, args.forbid, args.top))
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'config': {'repeat': args.repeat, 'forbid': args.forbid},
+        'results': results
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+    # Ненулевой код возврата для CI: запрещенный модуль или побочные эффекты при импорте
+    if any(item.get('forbidden') or item.get('created_files') for item in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Постоянные идентичности браузера для Dzen News Scraper
+Хранит cookies/localStorage (storage state) и дисковый HTTP-кэш отдельно
+для каждого User-Agent, чтобы повторные запуски не выглядели как первый визит
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserIdentityStore:
+    """Хранилище идентичностей браузера: storage state и HTTP-кэш на каждый User-Agent"""
+
+    # Типы ресурсов, которые кэшируются на диске
+    CACHEABLE_TYPES = ('script', 'stylesheet', 'font', 'image')
+    DEFAULT_CACHE_TTL = 24 * 3600
+
+    def __init__(self, state_dir: str, max_age_hours: float = 72.0):
+        self.state_dir = Path(state_dir)
+        self.max_age_hours = max_age_hours
+        self.identities: Dict[str, Dict] = {}
+
+    def identity_id(self, user_agent: str) -> str:
+        """Идентификатор идентичности по User-Agent"""
+        return hashlib.sha1(user_agent.encode('utf-8')).hexdigest()[:12]
+
+    def identity_dir(self, identity: Dict) -> Path:
+        return self.state_dir / identity['id']
+
+    def get_identity(self, user_agent: str) -> Dict:
+        """Получение идентичности с ротацией по возрасту"""
+        identity_id = self.identity_id(user_agent)
+        identity = self.identities.get(identity_id)
+
+        if identity is None:
+            identity = self._load_meta(identity_id) or self._new_identity(identity_id, user_agent)
+            self.identities[identity_id] = identity
+
+        if self.get_age_hours(identity) > self.max_age_hours:
+            logger.info(f"Ротация идентичности {identity_id}: возраст {self.get_age_hours(identity):.1f} ч")
+            shutil.rmtree(self.identity_dir(identity), ignore_errors=True)
+            identity = self._new_identity(identity_id, user_agent)
+            self.identities[identity_id] = identity
+
+        identity['visits'] += 1
+        identity['last_used'] = time.time()
+        return identity
+
+    def _new_identity(self, identity_id: str, user_agent: str) -> Dict:
+        return {
+            'id': identity_id,
+            'user_agent': user_agent,
+            'created_at': time.time(),
+            'last_used': time.time(),
+            'visits': 0,
+            'state_restored': 0,
+            'cache_hits': 0,
+            'cache_misses': 0
+        }
+
+    def _load_meta(self, identity_id: str) -> Optional[Dict]:
+        meta_path = self.state_dir / identity_id / 'meta.json'
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, identity: Dict):
+        identity_dir = self.identity_dir(identity)
+        identity_dir.mkdir(parents=True, exist_ok=True)
+        with open(identity_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(identity, f, ensure_ascii=False, indent=2)
+
+    def get_age_hours(self, identity: Dict) -> float:
+        return (time.time() - identity['created_at']) / 3600
+
+    def storage_state_path(self, identity: Dict) -> Optional[str]:
+        """Путь к сохраненному storage state, если он есть"""
+        path = self.identity_dir(identity) / 'storage_state.json'
+        if path.exists():
+            identity['state_restored'] += 1
+            return str(path)
+        return None
+
+    async def attach(self, context, identity: Dict):
+        """Подключение дискового HTTP-кэша к контексту браузера"""
+        cache_dir = self.identity_dir(identity) / 'http_cache'
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        async def handle(route):
+            await self._handle_route(route, identity, cache_dir)
+
+        await context.route('**/*', handle)
+
+    async def _handle_route(self, route, identity: Dict, cache_dir: Path):
+        request = route.request
+        if request.method != 'GET' or request.resource_type not in self.CACHEABLE_TYPES:
+            await route.continue_()
+            return
+
+        key = hashlib.sha1(request.url.encode('utf-8')).hexdigest()
+        body_path = cache_dir / key
+        meta_path = cache_dir / f'{key}.json'
+
+        cached = await asyncio.to_thread(self._read_cached, body_path, meta_path)
+        if cached:
+            identity['cache_hits'] += 1
+            headers, body = cached
+            await route.fulfill(status=200, headers=headers, body=body)
+            return
+
+        identity['cache_misses'] += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"Ошибка загрузки ресурса {request.url}: {e}")
+            await route.abort()
+            return
+
+        ttl = self._get_ttl(response.headers)
+        if response.status == 200 and ttl > 0:
+            await asyncio.to_thread(self._write_cached, body_path, meta_path,
+                                    response.headers, body, ttl)
+
+        await route.fulfill(response=response, body=body)
+
+    def _get_ttl(self, headers: Dict[str, str]) -> int:
+        """Время жизни ресурса в кэше по заголовку Cache-Control"""
+        cache_control = headers.get('cache-control', '').lower()
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return 0
+
+        match = re.search(r'max-age=(\d+)', cache_control)
+        return int(match.group(1)) if match else self.DEFAULT_CACHE_TTL
+
+    def _read_cached(self, body_path: Path, meta_path: Path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['expires_at'] < time.time():
+                return None
+            return meta['headers'], body_path.read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cached(self, body_path: Path, meta_path: Path, headers: Dict[str, str],
+                      body: bytes, ttl: int):
+        # Тело уже распаковано, поэтому заголовки кодирования не сохраняем
+        headers = {
+            name: value for name, value in headers.items()
+            if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+        }
+        try:
+            body_path.write_bytes(body)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'headers': headers, 'expires_at': time.time() + ttl}, f)
+        except OSError as e:
+            logger.debug(f"Не удалось сохранить ресурс в кэш: {e}")
+
+    async def save(self, context, identity: Dict):
+        """Сохранение storage state и статистики идентичности"""
+        identity_dir = self.identity_dir(identity)
+        identity_dir.mkdir(parents=True, exist_ok=True)
+        await context.storage_state(path=str(identity_dir / 'storage_state.json'))
+        await asyncio.to_thread(self._save_meta, identity)
+
+    def get_stats(self) -> List[Dict]:
+        """Статистика идентичностей, использованных в этом запуске"""
+        stats = []
+        for identity in self.identities.values():
+            requests = identity['cache_hits'] + identity['cache_misses']
+            stats.append({
+                'id': identity['id'],
+                'user_agent': identity['user_agent'],
+                'age_hours': round(self.get_age_hours(identity), 1),
+                'visits': identity['visits'],
+                'state_restored': identity['state_restored'],
+                'cache_hits': identity['cache_hits'],
+                'cache_misses': identity['cache_misses'],
+                'cache_hit_rate': round(identity['cache_hits'] / requests, 3) if requests else 0.0
+            })
+        return stats
+
+    def log_stats(self):
+        """Вывод статистики идентичностей в лог"""
+        for item in self.get_stats():
+            logger.info(
+                f"Идентичность {item['id']}: возраст {item['age_hours']} ч, "
+                f"визитов {item['visits']}, восстановлений состояния {item['state_restored']}, "
+                f"кэш {item['cache_hits']}/{item['cache_hits'] + item['cache_misses']} "
+                f"({item['cache_hit_rate']:.0%})"
+            )
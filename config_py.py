@@ -12,11 +12,65 @@ class Config:
     MAX_ARTICLES = int(os.getenv('MAX_ARTICLES', '30'))
     SAVE_FORMAT = os.getenv('SAVE_FORMAT', 'json')  # json, markdown, both
     
+    # Рубрики: отдельный фид на каждую (формат: name=url,name=url)
+    SCRAPE_RUBRICS = os.getenv('SCRAPE_RUBRICS', 'false').lower() == 'true'
+    RUBRICS = dict(
+        item.split('=', 1) for item in os.getenv(
+            'RUBRICS',
+            'main=https://dzen.ru/news,'
+            'politics=https://dzen.ru/news/rubric/politics,'
+            'economy=https://dzen.ru/news/rubric/business,'
+            'technology=https://dzen.ru/news/rubric/computers,'
+            'regions=https://dzen.ru/news/region/moscow'
+        ).split(',') if '=' in item
+    )
+    MAX_CONCURRENT_PAGES = int(os.getenv('MAX_CONCURRENT_PAGES', '3'))
+    
     # Настройки браузера
     HEADLESS = os.getenv('HEADLESS', 'true').lower() == 'true'
     BROWSER_TIMEOUT = int(os.getenv('BROWSER_TIMEOUT', '30000'))
     PAGE_TIMEOUT = int(os.getenv('PAGE_TIMEOUT', '20000'))
     
+    # Извлечение текста статей: dom - запросами к странице, snapshot - из HTML-снимка
+    EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'dom')
+    EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', '2'))
+    
+    # Бюджет времени запуска (секунды): должен укладываться в интервал планировщика
+    RUN_TIME_BUDGET = float(os.getenv('RUN_TIME_BUDGET', str(25 * 60)))
+    # Состояние между запусками хранится отдельно от результатов в OUTPUT_DIR,
+    # иначе веб-интерфейс принимает его за файлы статей
+    STATE_DIR = os.getenv('STATE_DIR', './state')
+    CARRYOVER_PATH = os.getenv('CARRYOVER_PATH', f'{STATE_DIR}/carryover.json')
+    SEEN_URLS_PATH = os.getenv('SEEN_URLS_PATH', f'{STATE_DIR}/seen_urls.json')
+    
+    # Канонические URL статей: кэш раскрытых редиректов
+    CANONICAL_URLS_PATH = os.getenv('CANONICAL_URLS_PATH', f'{STATE_DIR}/canonical_urls.json')
+    RESOLVE_REDIRECTS = os.getenv('RESOLVE_REDIRECTS', 'true').lower() == 'true'
+    
+    # Очередь задач и воркеры: все запуски идут через очередь; без воркеров (false)
+    # задачи выполняют сами планировщик и веб-интерфейс
+    USE_JOB_QUEUE = os.getenv('USE_JOB_QUEUE', 'true').lower() == 'true'
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', './queue/jobs.db')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '1'))
+    
+    # Статические RSS-фиды: публикуются в конце запуска для раздачи через nginx/CDN
+    PUBLISH_FEEDS = os.getenv('PUBLISH_FEEDS', 'false').lower() == 'true'
+    FEEDS_DIR = os.getenv('FEEDS_DIR', './output/feeds')
+    
+    # WebSub: хаб в веб-интерфейсе рассылает подписчикам новые элементы фидов
+    PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', 'http://localhost:8000').rstrip('/')
+    FEEDS_BASE_URL = os.getenv('FEEDS_BASE_URL', '').rstrip('/')
+    WEBSUB_HUB_URL = os.getenv('WEBSUB_HUB_URL', f'{PUBLIC_BASE_URL}/websub')
+    WEBSUB_DB_PATH = os.getenv('WEBSUB_DB_PATH', './queue/websub.db')
+    WEBSUB_CONCURRENCY = int(os.getenv('WEBSUB_CONCURRENCY', '10'))
+    
+    # Полнотекстовый поиск по статьям
+    SEARCH_DB_PATH = os.getenv('SEARCH_DB_PATH', './queue/search.db')
+    
+    # Профилирование запусков
+    PROFILES_DIR = os.getenv('PROFILES_DIR', './profiles')
+    PROFILE_TRACE_SLOWEST = int(os.getenv('PROFILE_TRACE_SLOWEST', '3'))
+    
     # Настройки задержек
     MIN_DELAY = float(os.getenv('MIN_DELAY', '1.0'))
     MAX_DELAY = float(os.getenv('MAX_DELAY', '3.0'))
@@ -31,9 +85,17 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '5000'))
     MIN_PARAGRAPH_LENGTH = int(os.getenv('MIN_PARAGRAPH_LENGTH', '20'))
     
+    # Постоянные идентичности браузера (storage state и HTTP-кэш)
+    BROWSER_STATE_DIR = os.getenv('BROWSER_STATE_DIR', './browser_state')
+    IDENTITY_MAX_AGE_HOURS = float(os.getenv('IDENTITY_MAX_AGE_HOURS', '72'))
+    
     # Прокси настройки (если необходимо)
     USE_PROXY = os.getenv('USE_PROXY', 'false').lower() == 'true'
     PROXY_URL = os.getenv('PROXY_URL', '')
+    # Несколько прокси через запятую; PROXY_URL используется, если список пуст
+    PROXY_URLS = [url for url in os.getenv('PROXY_URLS', PROXY_URL).split(',') if url.strip()]
+    MAX_PAGES_PER_PROXY = int(os.getenv('MAX_PAGES_PER_PROXY', '2'))
+    PROXY_COOLDOWN = float(os.getenv('PROXY_COOLDOWN', '300'))
     
     # User Agents для ротации
     USER_AGENTS = [
@@ -55,6 +117,9 @@ class Config:
         'publish_date': 'time, .publish-date, [data-testid="publish-date"], .mg-story-date'
     }
     
+    # Статистика селекторов: порядок каскада по успешности для каждого домена
+    SELECTOR_STATS_PATH = os.getenv('SELECTOR_STATS_PATH', f'{STATE_DIR}/selector_stats.json')
+    
     # Настройки логирования
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -63,4 +128,6 @@ class Config:
     def create_directories(cls):
         """Создание необходимых директорий"""
         os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
-        os.makedirs(cls.LOGS_DIR, exist_ok=True)
\ No newline at end of file
+        os.makedirs(cls.LOGS_DIR, exist_ok=True)
+        os.makedirs(cls.STATE_DIR, exist_ok=True)
+        os.makedirs(cls.BROWSER_STATE_DIR, exist_ok=True)
\ No newline at end of file
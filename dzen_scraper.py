@@ -5,37 +5,295 @@ Dzen.ru News Scraper
 Использует Playwright для обхода защиты от ботов
 """
 
+from __future__ import annotations
+
+import argparse
 import asyncio
+import hashlib
 import json
 import logging
 import random
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
-from playwright.async_api import async_playwright, Browser, Page
-import aiofiles
+from article_model import Article, iter_json
+from browser_identity import BrowserIdentityStore
+from feed_publisher import MAIN_FEED_PATTERN, FeedPublisher, rubric_feed_pattern
+from html_extract import HtmlExtractor
+from proxy_pool import ProxyPool
+from search_index import ArticleSearchIndex
+from selector_stats import SelectorStats
+from url_canonicalizer import UrlCanonicalizer, strip_tracking_params
+
+# Playwright, aiofiles и профилировщик загружаются при первом использовании:
+# импорт модуля (воркеры, админка, тесты) не тянет браузерный стек
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, Page
+    from profiling import RunProfiler
 
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('dzen_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging():
+    """Настройка логирования при запуске из командной строки"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('dzen_scraper.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+# Скрипт подсчета уникальных валидных карточек: MutationObserver пересчитывает
+# количество при каждом изменении DOM, чтобы прокрутка знала, когда остановиться
+CARD_COUNTER_SCRIPT = """
+([cardSelector, linkSelector, excludePatterns]) => {
+    if (!window.__dzenCardCounter) {
+        const state = {count: 0, scheduled: false};
+        const recount = () => {
+            state.scheduled = false;
+            const urls = new Set();
+            for (const card of document.querySelectorAll(cardSelector)) {
+                const link = card.querySelector(linkSelector);
+                const href = link && link.href;
+                if (!href || !href.includes('dzen.ru')) continue;
+                if (excludePatterns.some(pattern => href.includes(pattern))) continue;
+                urls.add(href);
+            }
+            state.count = urls.size;
+        };
+        const observer = new MutationObserver(() => {
+            if (!state.scheduled) {
+                state.scheduled = true;
+                setTimeout(recount, 100);
+            }
+        });
+        observer.observe(document.body, {childList: true, subtree: true});
+        recount();
+        window.__dzenCardCounter = state;
+    }
+    return window.__dzenCardCounter.count;
+}
+"""
+
+
+class FeedCapture:
+    """Перехват JSON-ответов ленты новостей и построение карточек из них"""
+    
+    TITLE_KEYS = ('title', 'headline')
+    URL_KEYS = ('url', 'link', 'href', 'shareUrl', 'share_url')
+    ID_KEYS = ('id', 'storyId', 'story_id', 'docId', 'doc_id')
+    TIME_KEYS = ('publishedAt', 'published_at', 'pubDate', 'pub_date', 'time', 'timestamp', 'date')
+    SOURCE_KEYS = ('source', 'agency', 'publisher', 'domain')
+    SUMMARY_KEYS = ('annotation', 'snippet', 'lead', 'summary', 'description', 'text')
+    # Карточкой считаются только ссылки на сюжеты: рубрики, меню и прочие ссылки
+    # с заголовком встречаются в тех же ответах
+    STORY_PATHS = ('/news/story/', '/news/instory/')
+    
+    def __init__(self, scraper: 'DzenNewsScraper'):
+        self.scraper = scraper
+        self.records: List[Article] = []
+        self.payloads = 0
+        self._seen_urls = set()
+        self._pending = set()
+        self._last_payload_at = asyncio.get_running_loop().time()
+    
+    def on_response(self, response):
+        """Обработчик события response: JSON ленты разбирается в фоне"""
+        if response.request.resource_type not in ('xhr', 'fetch'):
+            return
+        if 'json' not in response.headers.get('content-type', ''):
+            return
+        if 'dzen.ru' not in urlparse(response.url).netloc:
+            return
+        
+        task = asyncio.ensure_future(self._read_response(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _read_response(self, response):
+        try:
+            payload = await response.json()
+        except Exception as e:
+            logger.debug(f"Не удалось разобрать JSON {response.url}: {e}")
+            return
+        
+        added = self.add_payload(payload)
+        if added:
+            self.payloads += 1
+            self._last_payload_at = asyncio.get_running_loop().time()
+            logger.debug(f"Из ответа {response.url} получено {added} карточек")
+    
+    def add_payload(self, payload) -> int:
+        """Поиск карточек в JSON-ответе, возвращает количество новых"""
+        added = 0
+        for node in self._walk(payload):
+            record = self._build_record(node)
+            if record and record.url_key not in self._seen_urls:
+                self._seen_urls.add(record.url_key)
+                self.records.append(record)
+                added += 1
+        return added
+    
+    def _walk(self, node):
+        """Обход JSON в глубину с выдачей всех словарей"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, dict):
+                yield current
+                stack.extend(reversed(list(current.values())))
+            elif isinstance(current, list):
+                stack.extend(reversed(current))
+    
+    def _first(self, node: Dict, keys) -> Optional[object]:
+        for key in keys:
+            value = node.get(key)
+            if value not in (None, '', [], {}):
+                return value
+        return None
+    
+    def _build_record(self, node: Dict) -> Optional[Article]:
+        title = self._first(node, self.TITLE_KEYS)
+        href = self._first(node, self.URL_KEYS)
+        if not isinstance(title, str) or not isinstance(href, str):
+            return None
+        
+        full_url = urljoin(self.scraper.base_url, href)
+        if not self.scraper.is_valid_news_url(full_url):
+            return None
+        if not urlparse(full_url).path.startswith(self.STORY_PATHS):
+            return None
+        
+        summary = self._first(node, self.SUMMARY_KEYS)
+        source = self._first(node, self.SOURCE_KEYS)
+        if isinstance(source, dict):
+            source = self._first(source, ('name', 'title', 'domain'))
+        card_id = self._first(node, self.ID_KEYS)
+        
+        return Article(
+            title=title.strip(),
+            url=full_url,
+            summary=summary.strip()[:300] if isinstance(summary, str) else "",
+            scraped_at=datetime.now().isoformat(),
+            card_id=str(card_id) if card_id is not None else "",
+            published_at=self._parse_time(self._first(node, self.TIME_KEYS)),
+            source=source if isinstance(source, str) else ""
+        )
+    
+    def _parse_time(self, value) -> str:
+        """Приведение времени из ответа API к ISO формату"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Миллисекунды или секунды от эпохи
+            seconds = value / 1000 if value > 10 ** 11 else value
+            try:
+                return datetime.fromtimestamp(seconds).isoformat()
+            except (OverflowError, OSError, ValueError):
+                return ""
+        return value if isinstance(value, str) else ""
+    
+    async def drain(self):
+        """Ожидание разбора всех полученных ответов"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+    
+    async def wait_for_records(self, target_count: int, quiet_window: float, max_wait: float):
+        """Ожидание карточек, пока не наберется target_count или ответы не перестанут приходить"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while loop.time() - started < max_wait:
+            await asyncio.sleep(0.25)
+            await self.drain()
+            if len(self.records) >= target_count:
+                break
+            if loop.time() - self._last_payload_at > quiet_window:
+                break
+
+
 class DzenNewsScraper:
     def __init__(self):
         self.base_url = "https://dzen.ru/news"
         self.browser: Optional[Browser] = None
-        self.collected_articles: List[Dict] = []
+        self.collected_articles: List[Article] = []
+        
+        # Рубрики для сбора отдельных фидов (имя -> URL)
+        self.rubrics = {
+            'main': self.base_url,
+            'politics': 'https://dzen.ru/news/rubric/politics',
+            'economy': 'https://dzen.ru/news/rubric/business',
+            'technology': 'https://dzen.ru/news/rubric/computers',
+            'regions': 'https://dzen.ru/news/region/moscow'
+        }
+        self.max_concurrent_pages = 3
+        
+        # Настройки прокрутки: ожидание новых карточек и предел числа прокруток
+        self.scroll_idle_timeout = 3.0
+        self.max_scrolls = 40
+        
+        # Перехват JSON-ответов ленты вместо разбора DOM (с откатом на DOM)
+        self.capture_feed_responses = True
+        self.capture_quiet_window = 2.0
+        self.capture_max_wait = 10.0
+        
+        # Извлечение текста статей: 'dom' - запросами к живой странице, 'snapshot' -
+        # из HTML-снимка в пуле процессов, страница сразу освобождается для следующей статьи
+        self.extraction_mode = 'dom'
+        self.html_extractor = HtmlExtractor(workers=2)
+        
+        # Постоянные идентичности браузера (cookies, HTTP-кэш) на каждый User-Agent
+        self.identity_store: Optional[BrowserIdentityStore] = BrowserIdentityStore('browser_state')
+        self.page_identities: Dict[Page, Dict] = {}
+        
+        # Пул прокси: назначается на каждый контекст браузера (None - без прокси)
+        self.proxy_pool: Optional[ProxyPool] = None
+        self.page_proxies: Dict[Page, Dict] = {}
+        
+        # Бюджет времени запуска: статьи загружаются по приоритету, а не уложившиеся
+        # в бюджет переносятся на следующий запуск
+        self.deadline: Optional[float] = None
+        self.deadline_margin = 30.0
+        self.default_article_estimate = 30.0
+        self.carryover_path = Path('carryover.json')
+        self.carryover_max_age_hours = 6
+        self.carried_over: List[Article] = []
+        
+        # Уже загруженные URL из прошлых запусков (URL -> время загрузки)
+        self.seen_urls_path = Path('seen_urls.json')
+        self.seen_urls_max_age_days = 7
+        self.seen_urls: Dict[str, str] = {}
+        
+        # Каталог файлов результатов (dzen_news_*.json и .md)
+        self.output_dir = Path('.')
+        
+        # Полнотекстовый индекс: новые статьи индексируются при сохранении
+        self.search_index: Optional[ArticleSearchIndex] = None
+        
+        # Статические RSS-фиды, публикуемые в конце запуска (None - не публиковать)
+        self.feed_publisher: Optional[FeedPublisher] = None
+        
+        # Профилировщик запуска (трассировки Playwright для самых медленных страниц)
+        self.profiler: Optional[RunProfiler] = None
+        
+        # Обратный вызов прогресса (готово, всего, сообщение), например для очереди задач
+        self.progress_callback: Optional[Callable[[int, int, str], None]] = None
+        
+        # Запись/воспроизведение сетевого трафика в HAR ('record', 'replay' или None)
+        self.har_mode: Optional[str] = None
+        self.har_dir: Optional[Path] = None
+        self.har_contexts = 0
+        self.run_report: Dict = {'stages': {}, 'articles': []}
+        
+        # Исключаемые разделы сайта
+        self.exclude_url_patterns = ['/video/', '/profile/', '/media/', '/live/']
+        
+        # Кэш уже загруженного контента статей (URL -> данные статьи),
+        # общий для всех рубрик в рамках одного запуска
+        self.url_cache: Dict[str, Dict] = {}
         
         # User agents для ротации
         self.user_agents = [
@@ -44,6 +302,14 @@ class DzenNewsScraper:
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         ]
         
+        # Канонические URL карточек (без параметров отслеживания и редиректов), постоянный кэш
+        self.url_canonicalizer: Optional[UrlCanonicalizer] = UrlCanonicalizer(
+            'canonical_urls.json', user_agent=self.user_agents[0]
+        )
+        
+        # Статистика селекторов по доменам: каскад упорядочивается по успешности
+        self.selector_stats: Optional[SelectorStats] = SelectorStats('selector_stats.json')
+        
         # Селекторы для парсинга
         self.selectors = {
             'news_cards': 'article[data-testid="news-card"], .news-card, [data-entity="news-card"]',
@@ -55,13 +321,49 @@ class DzenNewsScraper:
             'publish_date': 'time, .publish-date, [data-testid="publish-date"]'
         }
 
+    def set_har_mode(self, mode: str, har_dir: str):
+        """Включение записи или воспроизведения трафика через HAR-архивы"""
+        self.har_mode = mode
+        self.har_dir = Path(har_dir)
+        
+        # Канонические URL записанного запуска хранятся вместе с архивами
+        if self.url_canonicalizer:
+            self.url_canonicalizer.cache_path = self.har_dir / 'canonical_urls.json'
+        
+        if mode == 'record':
+            self.har_dir.mkdir(parents=True, exist_ok=True)
+            # Куки и кэш идентичности, как и выбор прокси, сделали бы запись невоспроизводимой
+            self.identity_store = None
+            self.proxy_pool = None
+        elif mode == 'replay':
+            if not list(self.har_dir.glob('context_*.har')):
+                raise FileNotFoundError(f"В {self.har_dir} нет HAR-архивов для воспроизведения")
+            # Воспроизведение полностью офлайн и детерминировано
+            self.identity_store = None
+            self.proxy_pool = None
+            # Результаты старых записей не должны попасть в рабочие файлы, поиск и фиды
+            self.output_dir = self.har_dir / 'output'
+            self.search_index = None
+            if self.feed_publisher:
+                logger.warning("Публикация фидов при воспроизведении HAR отключена")
+                self.feed_publisher = None
+            if self.url_canonicalizer:
+                self.url_canonicalizer.resolve_redirects = False
+            random.seed(0)
+        
+        logger.info(f"Режим HAR: {mode} ({self.har_dir})")
+
     async def init_browser(self) -> Browser:
         """Инициализация браузера с настройками для обхода защиты"""
+        from playwright.async_api import async_playwright
+
         playwright = await async_playwright().start()
         
         # Настройки браузера для обхода детекции ботов
         browser = await playwright.chromium.launch(
             headless=True,  # Можно поставить False для отладки
+            # Прокси задаются для каждого контекста отдельно (Chromium на Linux не требует
+            # глобального прокси при запуске)
             args=[
                 '--no-sandbox',
                 '--disable-blink-features=AutomationControlled',
@@ -78,14 +380,45 @@ class DzenNewsScraper:
 
     async def create_stealth_page(self) -> Page:
         """Создание страницы с эмуляцией человеческого поведения"""
-        context = await self.browser.new_context(
-            user_agent=random.choice(self.user_agents),
-            viewport={'width': 1920, 'height': 1080},
-            locale='ru-RU',
-            timezone_id='Europe/Moscow'
-        )
+        user_agent = random.choice(self.user_agents)
+        identity = self.identity_store.get_identity(user_agent) if self.identity_store else None
+        proxy = await self.proxy_pool.acquire() if self.proxy_pool else None
+        if self.proxy_pool and proxy is None:
+            # Без прокси контекст ходил бы в сеть напрямую с адреса сервера
+            raise RuntimeError("Все прокси исключены из пула, запуск остановлен")
+        
+        har_options = {}
+        if self.har_mode == 'record':
+            self.har_contexts += 1
+            har_options['record_har_path'] = str(self.har_dir / f'context_{self.har_contexts:03d}.har')
+        
+        try:
+            context = await self.browser.new_context(
+                user_agent=user_agent,
+                viewport={'width': 1920, 'height': 1080},
+                locale='ru-RU',
+                timezone_id='Europe/Moscow',
+                storage_state=self.identity_store.storage_state_path(identity) if identity else None,
+                proxy=self.proxy_pool.playwright_proxy(proxy) if proxy else None,
+                **har_options
+            )
+        except Exception:
+            if proxy:
+                await self.proxy_pool.release(proxy)
+            raise
+        
+        if identity:
+            await self.identity_store.attach(context, identity)
+        if self.har_mode == 'replay':
+            await self.route_from_har_archives(context)
+        if self.profiler:
+            await self.profiler.start_trace(context)
         
         page = await context.new_page()
+        if identity:
+            self.page_identities[page] = identity
+        if proxy:
+            self.page_proxies[page] = proxy
         
         # Удаляем признаки автоматизации
         await page.add_init_script("""
@@ -108,78 +441,226 @@ class DzenNewsScraper:
         
         return page
 
+    async def route_from_har_archives(self, context):
+        """Обслуживание всех запросов контекста из записанных HAR-архивов"""
+        # Маршруты проверяются в обратном порядке регистрации: сначала HAR,
+        # затем запрет всего, чего нет в архивах, чтобы не выходить в сеть
+        await context.route('**/*', lambda route: route.abort('internetdisconnected'))
+        for har_path in sorted(self.har_dir.glob('context_*.har')):
+            await context.route_from_har(str(har_path), not_found='fallback')
+
+    async def close_page(self, page: Page):
+        """Закрытие страницы вместе с контекстом и сохранением состояния идентичности"""
+        context = page.context
+        identity = self.page_identities.pop(page, None)
+        proxy = self.page_proxies.pop(page, None)
+        
+        try:
+            if self.profiler:
+                await self.profiler.stop_trace(context)
+            if identity:
+                await self.identity_store.save(context, identity)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить состояние браузера: {e}")
+        finally:
+            await context.close()
+            if proxy:
+                await self.proxy_pool.release(proxy)
+
+    async def navigate(self, page: Page, url: str, **kwargs):
+        """Переход по URL с учетом задержки и ошибок для прокси страницы"""
+        proxy = self.page_proxies.get(page)
+        if self.profiler:
+            # Отдельный фрагмент трассировки на каждую страницу
+            await self.profiler.start_chunk(page.context, url)
+        started = asyncio.get_running_loop().time()
+        
+        try:
+            response = await page.goto(url, **kwargs)
+        except Exception:
+            if proxy:
+                self.proxy_pool.record(proxy, ok=False)
+            raise
+        
+        if proxy:
+            ok = response is None or response.status < 500 and response.status not in (403, 407, 429)
+            self.proxy_pool.record(proxy, ok, asyncio.get_running_loop().time() - started)
+        return response
+
     async def human_like_delay(self, min_seconds: float = 1.0, max_seconds: float = 3.0):
         """Имитация человеческих задержек"""
+        if self.har_mode == 'replay':
+            return
         delay = random.uniform(min_seconds, max_seconds)
         await asyncio.sleep(delay)
 
-    async def get_news_cards(self, page: Page) -> List[Dict]:
-        """Получение карточек новостей с главной страницы"""
-        logger.info("Загрузка главной страницы Dzen...")
+    async def get_news_cards(self, page: Page, url: Optional[str] = None,
+                             max_articles: int = 50) -> List[Article]:
+        """Получение карточек новостей с главной страницы или страницы рубрики"""
+        url = url or self.base_url
+        logger.info(f"Загрузка страницы Dzen: {url}")
+        
+        capture = FeedCapture(self) if self.capture_feed_responses else None
+        if capture:
+            page.on('response', capture.on_response)
         
         try:
-            # Переходим на страницу новостей
-            await page.goto(self.base_url, wait_until='networkidle', timeout=30000)
-            await self.human_like_delay(2, 4)
+            if capture:
+                # В режиме перехвата не ждем полной отрисовки: карточки приходят в JSON
+                await self.navigate(page, url, wait_until='domcontentloaded', timeout=30000)
+                await capture.wait_for_records(max_articles, self.capture_quiet_window,
+                                               self.capture_max_wait)
+                if len(capture.records) >= max_articles:
+                    logger.info(f"Карточки получены из API-ответов: {len(capture.records)}")
+                    return capture.records[:max_articles]
+            else:
+                # Переходим на страницу новостей
+                await self.navigate(page, url, wait_until='networkidle', timeout=30000)
+                await self.human_like_delay(2, 4)
             
             # Ждем загрузки контента
             await page.wait_for_selector(self.selectors['news_cards'], timeout=15000)
             await self.human_like_delay(1, 2)
             
             # Прокручиваем страницу для загрузки дополнительного контента
-            await self.scroll_page(page)
+            await self.scroll_page(page, max_articles)
             
-            # Получаем все карточки новостей
-            cards = await page.query_selector_all(self.selectors['news_cards'])
-            logger.info(f"Найдено {len(cards)} карточек новостей")
+            if capture:
+                await capture.drain()
+                if len(capture.records) >= max_articles:
+                    logger.info(f"Карточки получены из API-ответов: {len(capture.records)}")
+                    return capture.records[:max_articles]
             
-            news_items = []
+            news_items = await self.parse_dom_cards(page, max_articles)
             
-            for i, card in enumerate(cards[:50]):  # Ограничиваем количество для демонстрации
-                try:
-                    title_elem = await card.query_selector(self.selectors['card_title'])
-                    link_elem = await card.query_selector(self.selectors['card_link'])
-                    summary_elem = await card.query_selector(self.selectors['card_summary'])
-                    
-                    if title_elem and link_elem:
-                        title = await title_elem.inner_text()
-                        href = await link_elem.get_attribute('href')
-                        summary = await summary_elem.inner_text() if summary_elem else ""
-                        
-                        # Формируем полную ссылку
-                        full_url = urljoin(self.base_url, href) if href else ""
-                        
-                        if title and full_url and self.is_valid_news_url(full_url):
-                            news_items.append({
-                                'title': title.strip(),
-                                'url': full_url,
-                                'summary': summary.strip()[:300] if summary else "",
-                                'scraped_at': datetime.now().isoformat()
-                            })
-                            logger.debug(f"Обработана карточка {i+1}: {title[:50]}...")
-                        
-                except Exception as e:
-                    logger.warning(f"Ошибка при обработке карточки {i+1}: {e}")
-                    continue
+            # Дополняем DOM-карточки структурированными полями из API-ответов
+            if capture and capture.records:
+                captured = {record.url_key: record for record in capture.records}
+                for item in news_items:
+                    record = captured.pop(item.url_key, None)
+                    if record:
+                        item.merge(record)
+                news_items.extend(list(captured.values())[:max_articles - len(news_items)])
             
             logger.info(f"Успешно собрано {len(news_items)} новостных карточек")
             return news_items
             
         except Exception as e:
             logger.error(f"Ошибка при получении карточек новостей: {e}")
+            if capture and capture.records:
+                return capture.records[:max_articles]
             return []
+        
+        finally:
+            if capture:
+                page.remove_listener('response', capture.on_response)
+
+    async def parse_dom_cards(self, page: Page, max_articles: int) -> List[Article]:
+        """Разбор карточек новостей из отрисованного DOM"""
+        domain = urlparse(page.url).netloc
+        cards = await self.query_cascade(page, 'news_cards', domain, query_all=True)
+        logger.info(f"Найдено {len(cards)} карточек новостей")
+        
+        news_items = []
+        seen_urls = set()
+        
+        for i, card in enumerate(cards):
+            if len(news_items) >= max_articles:
+                break
+            
+            try:
+                title_elem = await self.query_cascade(card, 'card_title', domain)
+                link_elem = await self.query_cascade(card, 'card_link', domain)
+                summary_elem = await self.query_cascade(card, 'card_summary', domain)
+                
+                if title_elem and link_elem:
+                    title = await title_elem.inner_text()
+                    href = await link_elem.get_attribute('href')
+                    summary = await summary_elem.inner_text() if summary_elem else ""
+                    
+                    # Формируем полную ссылку
+                    full_url = urljoin(self.base_url, href) if href else ""
+                    
+                    if title and full_url and full_url not in seen_urls and self.is_valid_news_url(full_url):
+                        seen_urls.add(full_url)
+                        news_items.append(Article(
+                            title=title.strip(),
+                            url=full_url,
+                            summary=summary.strip()[:300] if summary else "",
+                            scraped_at=datetime.now().isoformat()
+                        ))
+                        logger.debug(f"Обработана карточка {i+1}: {title[:50]}...")
+                    
+            except Exception as e:
+                logger.warning(f"Ошибка при обработке карточки {i+1}: {e}")
+                continue
+        
+        return news_items
+
+    async def query_cascade(self, root, key: str, domain: str, query_all: bool = False):
+        """Запрос по каскаду селекторов: альтернативы по очереди, начиная с исторически успешной"""
+        if not self.selector_stats:
+            selector = self.selectors[key]
+            return await root.query_selector_all(selector) if query_all else await root.query_selector(selector)
+        
+        alternatives = self.selector_stats.ordered(domain, key, self.selectors[key])
+        if query_all:
+            # Списки (карточки) - объединение всех альтернатив, как у исходного селектора через запятую
+            # и у счетчика карточек при прокрутке; статистика ведется по каждой альтернативе
+            hits = {}
+            for alternative in alternatives:
+                found = await root.query_selector_all(alternative)
+                self.selector_stats.record(domain, key, alternative, bool(found))
+                if found:
+                    hits[alternative] = found
+            if len(hits) > 1:
+                # Один общий запрос: элементы без повторов и в порядке документа
+                return await root.query_selector_all(', '.join(hits))
+            return next(iter(hits.values()), [])
+        
+        probe = self.selector_stats.should_probe(key)
+        result = None
+        for alternative in alternatives:
+            found = await root.query_selector(alternative)
+            self.selector_stats.record(domain, key, alternative, bool(found))
+            if found and not result:
+                result = found
+                # Обычно останавливаемся на первом попадании; при проверке - опрашиваем все
+                if not probe:
+                    break
+        return result
+
+    async def scroll_page(self, page: Page, target_count: int):
+        """Прокрутка страницы, пока не загрузится target_count карточек или не перестанут появляться новые"""
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-    async def scroll_page(self, page: Page):
-        """Прокрутка страницы для загрузки дополнительного контента"""
         try:
-            # Постепенная прокрутка
-            for i in range(3):
-                await page.evaluate(f"window.scrollTo(0, {(i + 1) * 1000})")
-                await self.human_like_delay(1, 2)
+            count = await page.evaluate(CARD_COUNTER_SCRIPT, [
+                self.selectors['news_cards'],
+                self.selectors['card_link'],
+                self.exclude_url_patterns
+            ])
+            
+            scrolls = 0
+            while count < target_count and scrolls < self.max_scrolls:
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                scrolls += 1
                 
-            # Прокрутка вверх
-            await page.evaluate("window.scrollTo(0, 0)")
-            await self.human_like_delay(1, 2)
+                # Ждем появления новых карточек; если их нет - лента закончилась
+                try:
+                    await page.wait_for_function(
+                        "count => window.__dzenCardCounter.count > count",
+                        arg=count,
+                        timeout=self.scroll_idle_timeout * 1000
+                    )
+                except PlaywrightTimeoutError:
+                    logger.debug(f"Новые карточки не появились после прокрутки {scrolls}")
+                    break
+                
+                count = await page.evaluate("window.__dzenCardCounter.count")
+                await self.human_like_delay(0.2, 0.6)
+            
+            logger.info(f"Прокрутка завершена: {count} карточек за {scrolls} прокруток")
             
         except Exception as e:
             logger.warning(f"Ошибка при прокрутке: {e}")
@@ -190,23 +671,26 @@ class DzenNewsScraper:
             return False
             
         parsed = urlparse(url)
-        if not parsed.netlify or 'dzen.ru' not in parsed.netlify:
+        if not parsed.netloc or 'dzen.ru' not in parsed.netloc:
             return False
             
         # Исключаем нежелательные URL
-        exclude_patterns = ['/video/', '/profile/', '/media/', '/live/']
-        return not any(pattern in url for pattern in exclude_patterns)
+        return not any(pattern in url for pattern in self.exclude_url_patterns)
 
     async def get_article_content(self, page: Page, url: str) -> Dict:
         """Получение полного содержимого статьи"""
         logger.debug(f"Получение контента статьи: {url}")
         
+        if self.extraction_mode == 'snapshot':
+            return await self.extract_snapshot(await self.get_article_html(page, url), url)
+        
         try:
-            await page.goto(url, wait_until='networkidle', timeout=20000)
+            await self.navigate(page, url, wait_until='networkidle', timeout=20000)
             await self.human_like_delay(1, 3)
             
             # Ищем контент статьи
-            content_elem = await page.query_selector(self.selectors['article_content'])
+            domain = urlparse(page.url).netloc
+            content_elem = await self.query_cascade(page, 'article_content', domain)
             if not content_elem:
                 # Альтернативные селекторы
                 content_elem = await page.query_selector('main, .content, .post-content')
@@ -216,7 +700,7 @@ class DzenNewsScraper:
             
             if content_elem:
                 # Получаем текстовые параграфы
-                paragraphs = await content_elem.query_selector_all(self.selectors['article_text'])
+                paragraphs = await self.query_cascade(content_elem, 'article_text', domain, query_all=True)
                 content_parts = []
                 
                 for p in paragraphs:
@@ -227,7 +711,7 @@ class DzenNewsScraper:
                 content = '\n\n'.join(content_parts)
             
             # Ищем дату публикации
-            date_elem = await page.query_selector(self.selectors['publish_date'])
+            date_elem = await self.query_cascade(page, 'publish_date', domain)
             if date_elem:
                 publish_date = await date_elem.get_attribute('datetime')
                 if not publish_date:
@@ -243,79 +727,331 @@ class DzenNewsScraper:
             logger.warning(f"Ошибка при получении контента {url}: {e}")
             return {'content': "", 'publish_date': "", 'content_length': 0}
 
-    async def scrape_full_articles(self, news_items: List[Dict]) -> List[Dict]:
-        """Получение полного содержимого для всех статей"""
+    async def get_article_html(self, page: Page, url: str) -> str:
+        """HTML-снимок статьи: страница нужна только до получения разметки"""
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        try:
+            await self.navigate(page, url, wait_until='domcontentloaded', timeout=20000)
+            try:
+                await page.wait_for_selector(self.selectors['article_content'], state='attached', timeout=5000)
+            except PlaywrightTimeoutError:
+                logger.debug(f"Контейнер статьи не найден, берем снимок как есть: {url}")
+            return await page.content()
+        except Exception as e:
+            logger.warning(f"Ошибка при получении HTML {url}: {e}")
+            return ""
+
+    async def extract_snapshot(self, html: str, url: str) -> Dict:
+        """Извлечение текста из HTML-снимка в пуле, вне event loop"""
+        if not html:
+            return {'content': "", 'publish_date': "", 'content_length': 0}
+        try:
+            return await self.html_extractor.extract(html, url)
+        except Exception as e:
+            logger.warning(f"Ошибка при извлечении текста {url}: {e}")
+            return {'content': "", 'publish_date': "", 'content_length': 0}
+
+    def load_state(self):
+        """Загрузка перенесенных статей и истории загруженных URL"""
+        # Воспроизведение HAR не зависит от состояния машины: перенесенных статей нет в архивах
+        if self.har_mode == 'replay':
+            return
+        now = datetime.now()
+        
+        try:
+            with open(self.seen_urls_path, 'r', encoding='utf-8') as f:
+                seen_urls = json.load(f)
+            cutoff = (now - timedelta(days=self.seen_urls_max_age_days)).isoformat()
+            self.seen_urls = {
+                strip_tracking_params(url): seen_at for url, seen_at in seen_urls.items() if seen_at > cutoff
+            }
+        except (OSError, ValueError):
+            self.seen_urls = {}
+        
+        try:
+            with open(self.carryover_path, 'r', encoding='utf-8') as f:
+                carryover = json.load(f)
+            cutoff = (now - timedelta(hours=self.carryover_max_age_hours)).isoformat()
+            self.carried_over = [
+                Article.from_dict(item) for item in carryover if item.get('carried_over_at', '') > cutoff
+            ]
+        except (OSError, ValueError):
+            self.carried_over = []
+        
+        if self.carried_over:
+            logger.info(f"Перенесено с прошлого запуска: {len(self.carried_over)} статей")
+
+    def save_state(self):
+        """Сохранение перенесенных статей и истории загруженных URL"""
+        try:
+            with open(self.seen_urls_path, 'w', encoding='utf-8') as f:
+                json.dump(self.seen_urls, f, ensure_ascii=False)
+            with open(self.carryover_path, 'w', encoding='utf-8') as f:
+                f.writelines(iter_json(self.carried_over))
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить состояние запуска: {e}")
+        if self.url_canonicalizer:
+            self.url_canonicalizer.save()
+        if self.selector_stats:
+            self.selector_stats.save()
+
+    async def canonicalize_items(self, items: List[Article], page: Optional[Page] = None) -> List[Article]:
+        """Замена ссылок карточек адресами после редиректов и удаление дублей одной статьи"""
+        if not self.url_canonicalizer or not items:
+            return items
+        
+        # Запросы идут через контекст страницы: с ее прокси и cookies идентичности
+        request = page.context.request if page else None
+        canonical = await self.url_canonicalizer.canonicalize_many((item.url for item in items), request)
+        unique_items: Dict[str, Article] = {}
+        for item in items:
+            # Браузер открывает адрес с исходными параметрами; дубли ищутся по ключу без отслеживания
+            item.url = canonical[item.url]
+            unique_items.setdefault(item.url_key, item)
+        
+        if len(unique_items) < len(items):
+            logger.info(f"Дубликатов по каноническому URL: {len(items) - len(unique_items)}")
+        return list(unique_items.values())
+
+    def prioritize_items(self, news_items: List[Article]) -> List[Article]:
+        """Упорядочивание статей: сначала новые URL, затем по позиции карточки и свежести"""
+        now = datetime.now()
+        
+        def priority(indexed_item):
+            position, item = indexed_item
+            age_hours = 0.0
+            published_at = item.published_at
+            if published_at:
+                try:
+                    published = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+                    if published.tzinfo:
+                        published = published.astimezone().replace(tzinfo=None)
+                    age_hours = max((now - published).total_seconds() / 3600, 0.0)
+                except ValueError:
+                    pass
+            # Час возраста весит как две позиции в ленте
+            return (item.url_key in self.seen_urls, position + 2 * age_hours)
+        
+        return [item for _, item in sorted(enumerate(news_items), key=priority)]
+
+    def merge_carried_over(self, news_items: List[Article]) -> List[Article]:
+        """Добавление перенесенных с прошлого запуска статей к свежим карточкам"""
+        urls = {item.url_key for item in news_items}
+        carried = [item for item in self.carried_over if item.url_key not in urls]
+        self.carried_over = []
+        return news_items + carried
+
+    def keep_carried_over(self, items: List[Article]):
+        """Возврат в перенос статей прошлых запусков, отброшенных лимитом количества"""
+        carried = [item for item in items if item.carried_over_at]
+        if carried:
+            self.carried_over.extend(carried)
+            logger.info(f"Не вошли в лимит и остаются перенесенными: {len(carried)} статей")
+
+    def time_left(self) -> Optional[float]:
+        """Оставшееся время бюджета запуска"""
+        if self.deadline is None:
+            return None
+        return self.deadline - asyncio.get_running_loop().time()
+
+    async def scrape_full_articles(self, news_items: List[Article]) -> List[Article]:
+        """Получение полного содержимого для всех статей (до max_concurrent_pages страниц параллельно)"""
         logger.info(f"Начинаем сбор полного контента для {len(news_items)} статей...")
         
-        page = await self.create_stealth_page()
-        enriched_articles = []
+        processed: Dict[int, Article] = {}
+        extractions: List[asyncio.Task] = []
+        fetch_times: List[float] = []
+        # Общий итератор: статьи разбираются страницами по приоритету, каждая - один раз
+        pending = iter(enumerate(news_items))
+        budget_exhausted = False
         
-        for i, item in enumerate(news_items):
+        async def fetch_articles():
+            nonlocal budget_exhausted
+            page = await self.create_stealth_page()
             try:
-                logger.info(f"Обрабатываем статью {i+1}/{len(news_items)}: {item['title'][:50]}...")
-                
-                # Получаем полный контент
-                article_data = await self.get_article_content(page, item['url'])
-                
-                # Объединяем данные
-                full_article = {**item, **article_data}
-                enriched_articles.append(full_article)
-                
-                # Задержка между запросами
-                await self.human_like_delay(2, 5)
-                
-            except Exception as e:
-                logger.error(f"Ошибка при обработке статьи {item['url']}: {e}")
-                enriched_articles.append(item)  # Добавляем без контента
-                continue
+                for i, item in pending:
+                    if budget_exhausted:
+                        break
+                    try:
+                        # Статья уже загружена в этом запуске (например, из другой рубрики)
+                        if item.url_key in self.url_cache:
+                            item.update(self.url_cache[item.url_key])
+                            processed[i] = item
+                            continue
+                        
+                        # Не укладываемся в бюджет - оставшиеся статьи будут перенесены
+                        time_left = self.time_left()
+                        estimate = sum(fetch_times) / len(fetch_times) if fetch_times else self.default_article_estimate
+                        if time_left is not None and time_left - self.deadline_margin < estimate:
+                            budget_exhausted = True
+                            break
+                        
+                        logger.info(f"Обрабатываем статью {i+1}/{len(news_items)}: {item.title[:50]}...")
+                        self.report_progress(len(processed), len(news_items), f"Статья {i+1}/{len(news_items)}")
+                        
+                        # Получаем полный контент (в режиме снимка - только HTML)
+                        started = asyncio.get_running_loop().time()
+                        snapshot = self.extraction_mode == 'snapshot'
+                        fetch = self.get_article_html(page, item.url) if snapshot else self.get_article_content(page, item.url)
+                        if time_left is not None:
+                            try:
+                                result = await asyncio.wait_for(fetch, time_left - self.deadline_margin)
+                            except asyncio.TimeoutError:
+                                budget_exhausted = True
+                                break
+                        else:
+                            result = await fetch
+                        seconds = asyncio.get_running_loop().time() - started
+                        if self.profiler:
+                            # Задержка перед следующей статьей в трассировку страницы не входит
+                            await self.profiler.stop_chunk(page.context)
+                        
+                        if snapshot:
+                            # Разбор идет в пуле, пока страница загружает следующую статью
+                            extractions.append(asyncio.create_task(self.store_snapshot(item, result, seconds)))
+                        else:
+                            self.store_article(item, result, seconds)
+                        processed[i] = item
+                        
+                        # Задержка между запросами
+                        await self.human_like_delay(2, 5)
+                        fetch_times.append(asyncio.get_running_loop().time() - started)
+                        
+                    except Exception as e:
+                        logger.error(f"Ошибка при обработке статьи {item.url}: {e}")
+                        processed[i] = item  # Добавляем без контента
+            finally:
+                await self.close_page(page)
         
-        await page.close()
+        workers = max(1, min(self.max_concurrent_pages, len(news_items)))
+        results = await asyncio.gather(*(fetch_articles() for _ in range(workers)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка страницы загрузки статей: {result}")
+        if extractions:
+            await asyncio.gather(*extractions)
+        
+        # Не начатые статьи (бюджет исчерпан или страницы не открылись) переносятся
+        remaining = [item for i, item in enumerate(news_items) if i not in processed]
+        if remaining:
+            self.carry_over(remaining)
+        
+        enriched_articles = [processed[i] for i in sorted(processed)]
         logger.info(f"Завершен сбор контента. Обработано {len(enriched_articles)} статей")
         return enriched_articles
 
-    async def save_results(self, articles: List[Dict], format_type: str = 'json'):
+    def store_article(self, item: Article, article_data: Dict, seconds: float):
+        """Сохранение загруженного контента в карточке, кэше и отчете запуска"""
+        self.url_cache[item.url_key] = article_data
+        self.seen_urls[item.url_key] = datetime.now().isoformat()
+        self.run_report['articles'].append({
+            'url': item.url,
+            'seconds': round(seconds, 3),
+            'content_length': article_data['content_length'],
+            'content_sha1': hashlib.sha1(article_data['content'].encode('utf-8')).hexdigest()
+        })
+        # Дополняем карточку на месте, без копии записи
+        item.update(article_data)
+
+    async def store_snapshot(self, item: Article, html: str, seconds: float):
+        """Извлечение текста из снимка и сохранение результата"""
+        self.store_article(item, await self.extract_snapshot(html, item.url), seconds)
+
+    def report_progress(self, done: int, total: int, message: str):
+        """Передача прогресса запуска внешнему наблюдателю"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback(done, total, message)
+        except Exception as e:
+            logger.debug(f"Ошибка обработчика прогресса: {e}")
+
+    def carry_over(self, items: List[Article]):
+        """Перенос не загруженных статей на следующий запуск"""
+        carried_at = datetime.now().isoformat()
+        pending = [item for item in items if item.url_key not in self.url_cache]
+        self.carried_over.extend(
+            item.copy(carried_over_at=item.carried_over_at or carried_at) for item in pending
+        )
+        logger.warning(f"Не загружено в этом запуске: {len(pending)} статей перенесено на следующий запуск")
+
+    async def save_results(self, articles: List[Article], format_type: str = 'json',
+                           feed_name: Optional[str] = None):
         """Сохранение результатов в различных форматах"""
+        import aiofiles
+
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if feed_name:
+            timestamp = f'{feed_name}_{timestamp}'
         
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         if format_type == 'json':
-            filename = f'dzen_news_{timestamp}.json'
+            filename = self.output_dir / f'dzen_news_{timestamp}.json'
+            # Запись по статье: весь JSON целиком в памяти не строится
             async with aiofiles.open(filename, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(articles, ensure_ascii=False, indent=2))
+                for chunk in iter_json(articles):
+                    await f.write(chunk)
             logger.info(f"Результаты сохранены в {filename}")
             
+            if self.search_index:
+                try:
+                    # Файл отмечается проиндексированным: веб-интерфейс не индексирует его повторно
+                    indexed = await asyncio.to_thread(self.search_index.index_file, filename)
+                    logger.info(f"В поисковый индекс добавлено {indexed} статей")
+                except Exception as e:
+                    logger.warning(f"Ошибка индексации статей: {e}")
+            
         elif format_type == 'markdown':
-            filename = f'dzen_news_{timestamp}.md'
+            filename = self.output_dir / f'dzen_news_{timestamp}.md'
             content = self.generate_markdown_report(articles)
             async with aiofiles.open(filename, 'w', encoding='utf-8') as f:
                 await f.write(content)
             logger.info(f"Markdown отчет сохранен в {filename}")
 
-    def generate_markdown_report(self, articles: List[Dict]) -> str:
+    async def publish_feed(self, name: str, pattern: str) -> bool:
+        """Публикация статического фида из свежих файлов результатов"""
+        if not self.feed_publisher:
+            return False
+        try:
+            return await asyncio.to_thread(
+                self.feed_publisher.publish_recent, name, pattern, f'Dzen News Feed: {name}'
+            )
+        except Exception as e:
+            logger.warning(f"Ошибка публикации фида {name}: {e}")
+            return False
+
+    def generate_markdown_report(self, articles: List[Article]) -> str:
         """Генерация Markdown отчета"""
         report = f"# Новости Dzen.ru\n\n"
         report += f"**Дата сбора:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         report += f"**Количество статей:** {len(articles)}\n\n"
         
         for i, article in enumerate(articles, 1):
-            report += f"## {i}. {article['title']}\n\n"
-            report += f"**URL:** {article['url']}\n\n"
+            report += f"## {i}. {article.title}\n\n"
+            report += f"**URL:** {article.url}\n\n"
             
-            if article.get('publish_date'):
-                report += f"**Дата публикации:** {article['publish_date']}\n\n"
+            if article.publish_date:
+                report += f"**Дата публикации:** {article.publish_date}\n\n"
             
-            if article.get('summary'):
-                report += f"**Краткое описание:** {article['summary']}\n\n"
+            if article.summary:
+                report += f"**Краткое описание:** {article.summary}\n\n"
             
-            if article.get('content'):
-                report += f"**Полный текст:**\n{article['content'][:1000]}...\n\n"
+            if article.content:
+                report += f"**Полный текст:**\n{article.content[:1000]}...\n\n"
             
             report += "---\n\n"
         
         return report
 
-    async def run_scraper(self, max_articles: int = 30, save_format: str = 'json'):
+    async def run_scraper(self, max_articles: int = 30, save_format: str = 'json',
+                          time_budget: Optional[float] = None):
         """Основной метод запуска скрапера"""
         logger.info("Запуск Dzen News Scraper...")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.deadline = started + time_budget if time_budget else None
+        self.load_state()
         
         try:
             # Инициализация браузера
@@ -324,22 +1060,32 @@ class DzenNewsScraper:
             # Создаем страницу для сбора карточек
             page = await self.create_stealth_page()
             
-            # Собираем карточки новостей
-            news_items = await self.get_news_cards(page)
-            await page.close()
+            # Собираем карточки новостей; редиректы раскрываются в том же контексте
+            try:
+                news_items = await self.get_news_cards(page, max_articles=max_articles)
+                news_items = await self.canonicalize_items(news_items, page)
+            finally:
+                await self.close_page(page)
+            self.run_report['stages']['cards'] = round(loop.time() - started, 3)
             
             if not news_items:
                 logger.error("Не удалось получить новости. Проверьте селекторы или защиту сайта.")
                 return
             
-            # Ограничиваем количество статей
+            # Упорядочиваем по приоритету и ограничиваем количество статей;
+            # не вошедшие в лимит перенесенные статьи остаются в переносе
+            news_items = self.prioritize_items(self.merge_carried_over(news_items))
+            self.keep_carried_over(news_items[max_articles:])
             news_items = news_items[:max_articles]
             
             # Собираем полный контент
             full_articles = await self.scrape_full_articles(news_items)
+            self.run_report['stages']['articles'] = round(loop.time() - started, 3)
             
             # Сохраняем результаты
             await self.save_results(full_articles, save_format)
+            if save_format == 'json':
+                await self.publish_feed('main', MAIN_FEED_PATTERN)
             
             self.collected_articles = full_articles
             logger.info(f"Скрапинг завершен успешно. Собрано {len(full_articles)} статей.")
@@ -348,19 +1094,190 @@ class DzenNewsScraper:
             logger.error(f"Критическая ошибка при работе скрапера: {e}")
         
         finally:
-            if self.browser:
-                await self.browser.close()
+            self.run_report['stages']['total'] = round(loop.time() - started, 3)
+            await self.shutdown()
+
+    async def collect_rubric_cards(self, rubrics: Dict[str, str],
+                                   max_articles: int = 50) -> Dict[str, List[Article]]:
+        """Параллельный сбор карточек по рубрикам в общем браузере"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+        
+        async def collect(name: str, url: str) -> List[Article]:
+            async with semaphore:
+                page = await self.create_stealth_page()
+                try:
+                    items = await self.get_news_cards(page, url, max_articles)
+                    items = await self.canonicalize_items(items, page)
+                finally:
+                    await self.close_page(page)
+                
+                for item in items:
+                    item.rubric = name
+                logger.info(f"Рубрика '{name}': {len(items)} карточек")
+                return items
+        
+        results = await asyncio.gather(
+            *(collect(name, url) for name, url in rubrics.items()),
+            return_exceptions=True
+        )
+        
+        rubric_cards = {}
+        for name, result in zip(rubrics, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка при сборе рубрики '{name}': {result}")
+                result = []
+            rubric_cards[name] = result
+        return rubric_cards
+
+    async def run_rubrics(self, rubrics: Optional[Dict[str, str]] = None,
+                          max_articles: int = 30, save_format: str = 'json',
+                          time_budget: Optional[float] = None):
+        """Сбор нескольких рубрик за один запуск с отдельным фидом на рубрику"""
+        rubrics = rubrics or self.rubrics
+        logger.info(f"Запуск Dzen News Scraper по рубрикам: {', '.join(rubrics)}")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.deadline = started + time_budget if time_budget else None
+        self.load_state()
+        
+        try:
+            await self.init_browser()
+            
+            rubric_cards = await self.collect_rubric_cards(rubrics, max_articles)
+            self.run_report['stages']['cards'] = round(loop.time() - started, 3)
+            
+            # Объединяем карточки всех рубрик: каждая статья загружается один раз
+            unique_items: Dict[str, Article] = {}
+            for items in rubric_cards.values():
+                for item in items[:max_articles]:
+                    unique_items.setdefault(item.url_key, item)
+            
+            if not unique_items:
+                logger.error("Не удалось получить новости ни в одной рубрике.")
+                return
+            
+            total_cards = sum(len(items[:max_articles]) for items in rubric_cards.values())
+            logger.info(f"Уникальных статей: {len(unique_items)} из {total_cards} карточек")
+            
+            news_items = self.prioritize_items(self.merge_carried_over(list(unique_items.values())))
+            full_articles = await self.scrape_full_articles(news_items)
+            self.collected_articles = full_articles
+            self.run_report['stages']['articles'] = round(loop.time() - started, 3)
+            
+            # Сохраняем отдельный фид для каждой рубрики (без перенесенных статей)
+            carried_urls = {item.url_key for item in self.carried_over}
+            for name, items in rubric_cards.items():
+                # Статьи, перенесенные с прошлого запуска, попадают в свою рубрику
+                rubric_urls = {item.url_key for item in items[:max_articles]}
+                items = items[:max_articles] + [
+                    item for item in news_items
+                    if item.carried_over_at and item.rubric == name and item.url_key not in rubric_urls
+                ]
+                rubric_articles = []
+                for item in items:
+                    if item.url_key in carried_urls:
+                        continue
+                    # Копия разделяет строки с исходной записью, включая текст статьи
+                    article = item.copy(rubric=name)
+                    article.update(self.url_cache.get(item.url_key, {}))
+                    rubric_articles.append(article)
+                if not rubric_articles:
+                    continue
+                await self.save_results(rubric_articles, save_format, feed_name=name)
+                if save_format == 'json':
+                    await self.publish_feed(name, rubric_feed_pattern(name))
+            
+            logger.info(f"Скрапинг рубрик завершен. Собрано {len(full_articles)} статей.")
+            
+        except Exception as e:
+            logger.error(f"Критическая ошибка при работе скрапера: {e}")
+        
+        finally:
+            self.run_report['stages']['total'] = round(loop.time() - started, 3)
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Завершение запуска: статистика, отчет HAR и закрытие браузера"""
+        if self.selector_stats:
+            self.selector_stats.log_report()
+        if self.har_mode != 'replay':
+            self.save_state()
+        if self.identity_store:
+            self.identity_store.log_stats()
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        if self.url_canonicalizer:
+            self.url_canonicalizer.log_stats()
+        if self.browser:
+            await self.browser.close()
+        self.html_extractor.shutdown()
+        if self.har_mode:
+            self.save_har_report()
+
+    def save_har_report(self):
+        """Сохранение результатов и таймингов запуска рядом с HAR-архивами для сравнения версий"""
+        report_path = self.har_dir / f"{self.har_mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        report = {
+            'mode': self.har_mode,
+            'stages': self.run_report['stages'],
+            'articles': self.run_report['articles'],
+            'titles': [article.title for article in self.collected_articles]
+        }
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Отчет запуска сохранен в {report_path}")
+
+
+def parse_args() -> argparse.Namespace:
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Dzen News Scraper")
+    parser.add_argument('--max-articles', type=int, default=20,
+                        help="Максимальное количество статей для сбора")
+    parser.add_argument('--format', dest='save_format', default='json', choices=['json', 'markdown'],
+                        help="Формат сохранения результатов")
+    har_group = parser.add_mutually_exclusive_group()
+    har_group.add_argument('--record', metavar='DIR',
+                           help="Записать сетевой трафик запуска в HAR-архивы")
+    har_group.add_argument('--replay', metavar='DIR',
+                           help="Воспроизвести запуск из HAR-архивов без доступа к сети")
+    parser.add_argument('--extract', dest='extraction_mode', default='dom', choices=['dom', 'snapshot'],
+                        help="Извлечение текста: запросами к странице или из HTML-снимка в пуле процессов")
+    parser.add_argument('--publish', metavar='DIR',
+                        help="Публиковать статические RSS-фиды (feed_<имя>.xml и .gz) в каталог")
+    parser.add_argument('--profile', action='store_true',
+                        help="Профилировать запуск (CPU, память, зависания event loop, трассировки)")
+    parser.add_argument('--profile-dir', default='profiles',
+                        help="Каталог для результатов профилирования")
+    parser.add_argument('--profile-traces', type=int, default=3,
+                        help="Сохранять трассировки Playwright для N самых медленных страниц")
+    args = parser.parse_args()
+    if args.publish and args.replay:
+        parser.error("--publish нельзя использовать с --replay: записанные данные не публикуются")
+    return args
 
 
 async def main():
     """Основная функция запуска"""
+    args = parse_args()
+    setup_logging()
     scraper = DzenNewsScraper()
+    scraper.extraction_mode = args.extraction_mode
+    if args.publish:
+        scraper.feed_publisher = FeedPublisher(args.publish)
     
-    # Настройки запуска
-    max_articles = 20  # Максимальное количество статей для сбора
-    save_format = 'json'  # 'json' или 'markdown'
+    if args.record:
+        scraper.set_har_mode('record', args.record)
+    elif args.replay:
+        scraper.set_har_mode('replay', args.replay)
     
-    await scraper.run_scraper(max_articles, save_format)
+    if args.profile:
+        from profiling import RunProfiler
+
+        async with RunProfiler(args.profile_dir, trace_slowest=args.profile_traces) as profiler:
+            scraper.profiler = profiler
+            await scraper.run_scraper(args.max_articles, args.save_format)
+    else:
+        await scraper.run_scraper(args.max_articles, args.save_format)
     
     # Дополнительно сохраняем в markdown
     if scraper.collected_articles:
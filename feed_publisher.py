@@ -0,0 +1,211 @@
+"""
+Публикация статических RSS-фидов Dzen News Scraper
+Фиды рендерятся детерминированно, пишутся атомарно вместе со сжатыми .gz-копиями
+и перезаписываются только при изменении содержимого
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from article_model import Article, load_articles
+from url_canonicalizer import strip_tracking_params
+
+
+logger = logging.getLogger(__name__)
+
+RFC822_FORMAT = '%a, %d %b %Y %H:%M:%S %z'
+
+# Файлы результатов скрапера: все, только основной ленты (без рубрик) и одной рубрики.
+# Статический фид main и /rss.xml веб-интерфейса строятся по одному шаблону
+RESULTS_PATTERN = 'dzen_news_*.json'
+MAIN_FEED_PATTERN = 'dzen_news_[0-9]*.json'
+
+
+def rubric_feed_pattern(name: str) -> str:
+    return f'dzen_news_{name}_*.json'
+
+
+def parse_iso(value: str) -> Optional[datetime]:
+    """Дата ISO 8601 с часовым поясом (наивные даты считаются локальными)"""
+    try:
+        parsed = datetime.fromisoformat((value or '').replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def collect_recent_articles(directory: Path, pattern: str = RESULTS_PATTERN, recent_hours: int = 24,
+                            limit: int = 50) -> List[Article]:
+    """Статьи из свежих файлов результатов (новые файлы первыми) без полного текста и дублей"""
+    cutoff = datetime.now() - timedelta(hours=recent_hours)
+    files = [
+        file_path for file_path in Path(directory).glob(pattern)
+        if datetime.fromtimestamp(os.path.getctime(file_path)) > cutoff
+    ]
+
+    articles: List[Article] = []
+    guids = set()
+    # При равном времени (например, после git checkout) новее файл с более поздней меткой в имени
+    for file_path in sorted(files, key=lambda path: (os.path.getctime(path), path.name), reverse=True):
+        if len(articles) >= limit:
+            break
+        try:
+            file_articles = load_articles(file_path, with_content=False)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {file_path}: {e}")
+            continue
+        for article in file_articles:
+            guid = article.url_key
+            if guid and guid not in guids and len(articles) < limit:
+                guids.add(guid)
+                articles.append(article)
+    return articles
+
+
+def render_rss(articles: Iterable[Article], title: str = 'Dzen News Feed',
+               description: str = 'Автоматически собранные новости с Dzen.ru',
+               link: str = 'http://dzen.ru/news', hub_url: str = '', self_url: str = '') -> str:
+    """RSS 2.0 XML; результат зависит только от статей (lastBuildDate - по самой свежей)"""
+    rss_items = []
+    newest: Optional[datetime] = None
+    for article in articles:
+        item_title = escape(article.get('title', 'Без заголовка'))
+        url = escape(article.get('url', ''))
+        guid = escape(strip_tracking_params(article.get('url', '')))
+        summary = article.get('summary', '')
+        summary = escape(summary[:200] + '...' if len(summary) > 200 else summary)
+
+        published = parse_iso(article.get('scraped_at', ''))
+        pub_date = ''
+        if published:
+            pub_date = f"\n        <pubDate>{published.strftime(RFC822_FORMAT)}</pubDate>"
+            newest = max(newest, published) if newest else published
+
+        rss_items.append(f"""
+    <item>
+        <title>{item_title}</title>
+        <link>{url}</link>
+        <description>{summary}</description>{pub_date}
+        <guid>{guid}</guid>
+    </item>""")
+
+    last_build_date = f"\n        <lastBuildDate>{newest.strftime(RFC822_FORMAT)}</lastBuildDate>" if newest else ''
+    # Ссылки WebSub: подписчики получают обновления от хаба вместо опроса фида
+    websub_links = ''
+    if hub_url and self_url:
+        websub_links = (
+            f'\n        <atom:link rel="hub" href="{escape(hub_url)}"/>'
+            f'\n        <atom:link rel="self" href="{escape(self_url)}" type="application/rss+xml"/>'
+        )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">
+    <channel>
+        <title>{escape(title)}</title>
+        <description>{escape(description)}</description>
+        <link>{escape(link)}</link>
+        <language>ru-RU</language>{last_build_date}{websub_links}
+        {''.join(rss_items)}
+    </channel>
+</rss>"""
+
+
+def atomic_write(path: Path, data: bytes):
+    """Запись через временный файл и os.replace: читатели не видят частично записанный файл"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class FeedPublisher:
+    """Статические фиды для раздачи через nginx/CDN: feed_<имя>.xml, .gz и manifest.json"""
+
+    def __init__(self, publish_dir: str, results_dir: str = '.', recent_hours: int = 24,
+                 max_items: int = 50, compress: bool = True, base_url: str = '', hub_url: str = ''):
+        self.publish_dir = Path(publish_dir)
+        self.results_dir = Path(results_dir)
+        self.recent_hours = recent_hours
+        self.max_items = max_items
+        self.compress = compress
+        self.manifest_path = self.publish_dir / 'manifest.json'
+        # Публичный адрес каталога фидов и WebSub-хаб (пусто - без WebSub)
+        self.base_url = base_url.rstrip('/')
+        self.hub_url = hub_url
+        # Дополнительные топики фида на хабе, например /rss.xml веб-интерфейса (имя -> URL)
+        self.extra_topics: Dict[str, List[str]] = {}
+
+    def feed_url(self, name: str) -> str:
+        return f'{self.base_url}/feed_{name}.xml' if self.base_url else ''
+
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def publish(self, name: str, articles: Iterable[Article], title: str = 'Dzen News Feed') -> bool:
+        """Публикация фида; возвращает False, если содержимое не изменилось"""
+        articles = list(articles)
+        data = render_rss(articles, title=title, hub_url=self.hub_url, self_url=self.feed_url(name)).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        feed_path = self.publish_dir / f'feed_{name}.xml'
+        manifest = self.load_manifest()
+        entry = manifest.get(name, {})
+        if entry.get('sha256') == digest and feed_path.exists():
+            logger.info(f"Фид {feed_path} не изменился, запись пропущена")
+            return False
+
+        atomic_write(feed_path, data)
+        if self.compress:
+            # mtime=0: одинаковое содержимое дает побайтно одинаковый архив
+            atomic_write(feed_path.with_name(feed_path.name + '.gz'), gzip.compress(data, compresslevel=9, mtime=0))
+
+        manifest[name] = {
+            'file': feed_path.name,
+            'gz': feed_path.name + '.gz' if self.compress else None,
+            'sha256': digest,
+            'version': digest[:12],
+            'items': len(articles),
+            'size': len(data),
+            'published_at': datetime.now().isoformat()
+        }
+        atomic_write(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+        logger.info(f"Фид опубликован: {feed_path} ({len(articles)} статей, версия {digest[:12]})")
+        self.notify_hub(name)
+        return True
+
+    def notify_hub(self, name: str):
+        """Уведомление WebSub-хаба после обновления фида"""
+        topics = ([self.feed_url(name)] if self.base_url else []) + self.extra_topics.get(name, [])
+        if self.hub_url and topics:
+            from websub_hub import ping_hub
+            ping_hub(self.hub_url, topics)
+
+    def publish_recent(self, name: str, pattern: str, title: str = 'Dzen News Feed') -> bool:
+        """Публикация фида из свежих файлов результатов"""
+        articles = collect_recent_articles(self.results_dir, pattern, self.recent_hours, self.max_items)
+        if not articles:
+            logger.warning(f"Нет статей для фида {name}, публикация пропущена")
+            return False
+        return self.publish(name, articles, title=title)
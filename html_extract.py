@@ -0,0 +1,187 @@
+"""
+Извлечение текста статьи из HTML-снимка страницы для Dzen News Scraper
+Удаление служебных блоков в духе readability на lxml; разбор выполняется
+в пуле процессов или потоков, вне event loop
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Теги, которые никогда не содержат текст статьи
+DROP_TAGS = (
+    'script', 'style', 'noscript', 'iframe', 'svg', 'canvas', 'form', 'button',
+    'nav', 'header', 'footer', 'aside', 'template'
+)
+TEXT_TAGS = ('p', 'h2', 'h3', 'blockquote', 'li')
+
+# Признаки служебных и содержательных блоков в class/id
+NEGATIVE_RE = re.compile(
+    r'comment|footer|header|menu|nav|sidebar|share|social|related|recommend|promo|banner|'
+    r'advert|\bad-|-ad\b|popup|subscribe|widget|breadcrumb|tags|author-card|feed',
+    re.IGNORECASE
+)
+POSITIVE_RE = re.compile(r'article|content|body|text|story|entry|post|main', re.IGNORECASE)
+
+DATE_XPATHS = (
+    '//meta[@property="article:published_time"]/@content',
+    '//meta[@itemprop="datePublished"]/@content',
+    '//*[@itemprop="datePublished"]/@datetime',
+    '//time[@datetime]/@datetime',
+)
+
+MIN_PARAGRAPH_LENGTH = 25
+MAX_CONTENT_LENGTH = 5000
+
+
+def _class_weight(element) -> int:
+    """Вес элемента по class и id"""
+    weight = 0
+    for value in (element.get('class'), element.get('id')):
+        if not value:
+            continue
+        if NEGATIVE_RE.search(value):
+            weight -= 25
+        if POSITIVE_RE.search(value):
+            weight += 25
+    return weight
+
+
+def _link_density(element) -> float:
+    """Доля текста ссылок в тексте элемента"""
+    text_length = len(element.text_content())
+    if not text_length:
+        return 0.0
+    link_length = sum(len(link.text_content()) for link in element.iter('a'))
+    return link_length / text_length
+
+
+def _clean(tree):
+    """Удаление служебных тегов и блоков"""
+    for element in list(tree.iter(*DROP_TAGS)):
+        if element.getparent() is not None:
+            element.drop_tree()
+    for element in list(tree.iter()):
+        if element.getparent() is None or not isinstance(element.tag, str):
+            continue
+        marker = f"{element.get('class', '')} {element.get('id', '')}"
+        if NEGATIVE_RE.search(marker) and not POSITIVE_RE.search(marker) and element.tag not in ('html', 'body'):
+            element.drop_tree()
+
+
+def _best_candidate(tree):
+    """Поиск блока с наибольшей оценкой по абзацам (алгоритм readability)"""
+    scores: Dict = {}
+    for paragraph in tree.iter('p'):
+        text = paragraph.text_content().strip()
+        if len(text) < MIN_PARAGRAPH_LENGTH:
+            continue
+        score = 1 + text.count(',') + min(len(text) // 100, 3)
+
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        grandparent = parent.getparent()
+        for element, share in ((parent, 1.0), (grandparent, 0.5)):
+            if element is None:
+                continue
+            if element not in scores:
+                scores[element] = float(_class_weight(element))
+            scores[element] += score * share
+
+    if not scores:
+        return None
+    return max(scores, key=lambda element: scores[element] * (1 - _link_density(element)))
+
+
+def _publish_date(tree) -> str:
+    for xpath in DATE_XPATHS:
+        values = tree.xpath(xpath)
+        if values and str(values[0]).strip():
+            return str(values[0]).strip()
+    return ""
+
+
+def extract_article(html: str, url: str = '') -> Dict:
+    """Текст и дата публикации статьи из HTML; формат как у DOM-режима скрапера"""
+    # lxml нужен только в режиме snapshot и загружается в процессе-обработчике
+    from lxml import html as lxml_html
+    from lxml.etree import ParserError
+
+    try:
+        tree = lxml_html.document_fromstring(html)
+    except (ParserError, ValueError) as e:
+        logger.warning(f"Не удалось разобрать HTML {url}: {e}")
+        return {'content': "", 'publish_date': "", 'content_length': 0}
+
+    publish_date = _publish_date(tree)
+    _clean(tree)
+
+    content_parts = []
+    candidate = _best_candidate(tree)
+    if candidate is not None:
+        for element in candidate.iter(*TEXT_TAGS):
+            text = ' '.join(element.text_content().split())
+            # Короткие строки и блоки из ссылок отбрасываются
+            if len(text) > 20 and _link_density(element) < 0.5:
+                content_parts.append(text)
+
+    content = '\n\n'.join(content_parts)
+    return {
+        'content': content[:MAX_CONTENT_LENGTH],
+        'publish_date': publish_date,
+        'content_length': len(content)
+    }
+
+
+class HtmlExtractor:
+    """Пул для извлечения текста из HTML-снимков вне event loop"""
+
+    def __init__(self, workers: int = 2, use_processes: bool = True):
+        self.workers = workers
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Демонический процесс (воркер очереди) не может запускать дочерние процессы
+            if self.use_processes and multiprocessing.current_process().daemon:
+                logger.info("Извлечение текста в потоках: процесс-демон не может создать пул процессов")
+                self.use_processes = False
+            if self.use_processes:
+                # spawn: дочерние процессы не наследуют потоки Playwright
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='html-extract')
+        return self._executor
+
+    async def extract(self, html: str, url: str = '') -> Dict:
+        """Извлечение текста статьи в пуле"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, extract_article, html, url)
+        except (BrokenProcessPool, AssertionError, OSError) as e:
+            if not isinstance(executor, ProcessPoolExecutor):
+                raise
+            # Пул процессов недоступен: один раз сообщаем и продолжаем в потоках
+            if self._executor is executor:
+                logger.error(f"Пул процессов извлечения текста недоступен, переключение на потоки: {e}")
+                self._executor = None
+                self.use_processes = False
+                executor.shutdown(wait=False)
+            return await loop.run_in_executor(self._get_executor(), extract_article, html, url)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
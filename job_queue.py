@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Очередь задач Dzen News Scraper
+Хранит задачи в SQLite (приоритеты, прогресс, отмена) и выполняет скрапинг
+в отдельных процессах-воркерах, а не в веб-сервере
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Приоритеты задач: ручные запуски обгоняют плановые
+PRIORITY_SCHEDULED = 0
+PRIORITY_MANUAL = 10
+# Сколько раз задача может остаться без воркера (OOM, падение браузера), прежде чем считаться неудачной
+MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    """Персистентная очередь задач скрапера в SQLite"""
+
+    def __init__(self, db_path: str, max_attempts: int = MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, id)")
+            # Базы, созданные до появления счетчика попыток
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'attempts' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            self._initialized = True
+
+        return conn
+
+    def _to_dict(self, row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def enqueue(self, kind: str, params: Dict, priority: int = PRIORITY_MANUAL,
+                source: str = 'manual') -> Dict:
+        """Добавление задачи в очередь"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, source, params, priority, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, source, json.dumps(params, ensure_ascii=False), priority, datetime.now().isoformat())
+            )
+            job_id = cursor.lastrowid
+        logger.info(f"Задача {job_id} ({kind}, {source}) добавлена в очередь")
+        return self.get(job_id)
+
+    def claim_next(self, source: Optional[str] = None) -> Optional[Dict]:
+        """Атомарный захват следующей задачи воркером (только из source, если он задан)"""
+        query = "SELECT id FROM jobs WHERE status = 'queued'"
+        args: list = []
+        if source:
+            query += " AND source = ?"
+            args.append(source)
+        query += " ORDER BY priority DESC, id LIMIT 1"
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(query, args).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (os.getpid(), datetime.now().isoformat(), row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            # Если не удался сам BEGIN, транзакции нет, и ROLLBACK скрыл бы исходную ошибку
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return self.get(row['id'])
+
+    def update_progress(self, job_id: int, progress: float, message: str = ''):
+        """Обновление прогресса задачи (0.0 - 1.0)"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, message = ? WHERE id = ?",
+                (round(progress, 3), message, job_id)
+            )
+
+    def finish(self, job_id: int, status: str, result: Optional[Dict] = None,
+               error: Optional[str] = None):
+        """Завершение задачи с итоговым статусом"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, datetime.now().isoformat(), status, job_id)
+            )
+
+    def request_cancel(self, job_id: int) -> Optional[Dict]:
+        """Отмена задачи: ожидающая отменяется сразу, выполняющуюся останавливает воркер"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (datetime.now().isoformat(), job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, limit: int = 50, status: Optional[str] = None) -> List[Dict]:
+        """Список последних задач"""
+        query = "SELECT * FROM jobs"
+        args: list = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+
+        with closing(self._connect()) as conn:
+            return [self._to_dict(row) for row in conn.execute(query, args).fetchall()]
+
+    def has_active(self, source: str) -> bool:
+        """Есть ли ожидающая или выполняющаяся задача из данного источника"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM jobs WHERE source = ? AND status IN ('queued', 'running') LIMIT 1",
+                (source,)
+            ).fetchone()
+        return row is not None
+
+    def get_summary(self) -> Dict:
+        """Сводка по очереди для дашборда"""
+        with closing(self._connect()) as conn:
+            counts = {
+                row['status']: row['count']
+                for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+            }
+            last_run = conn.execute("SELECT MAX(started_at) AS value FROM jobs").fetchone()['value']
+            last_failed = conn.execute(
+                "SELECT error FROM jobs WHERE status = 'failed' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            results = conn.execute("SELECT result FROM jobs WHERE status = 'done' AND result IS NOT NULL")
+            total_articles = sum(json.loads(row['result']).get('articles', 0) for row in results)
+
+        return {
+            "is_running": counts.get('running', 0) > 0,
+            "queued": counts.get('queued', 0),
+            "last_run": last_run,
+            "total_runs": counts.get('done', 0),
+            "total_articles": total_articles,
+            "last_error": last_failed['error'] if last_failed else None
+        }
+
+    def requeue_orphaned(self, source: Optional[str] = None) -> int:
+        """Возврат в очередь задач, чьи воркеры завершились аварийно
+
+        Задача, после которой воркер падает max_attempts раз подряд, помечается неудачной,
+        чтобы не перезапускать ее бесконечно. source ограничивает проверку задачами,
+        которые выполняет этот процесс: PID из других контейнеров здесь не видны.
+        """
+        requeued = 0
+        for job in self.list_jobs(limit=1000, status='running'):
+            if source and job['source'] != source:
+                continue
+            if not job['worker_pid'] or _pid_alive(job['worker_pid']):
+                continue
+            with closing(self._connect()) as conn:
+                if job['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                        "WHERE id = ? AND status = 'running'",
+                        (f"Воркер завершался аварийно, попыток: {job['attempts']}", datetime.now().isoformat(), job['id'])
+                    )
+                    logger.error(f"Задача {job['id']} снята: воркер завершался аварийно, попыток: {job['attempts']}")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL, started_at = NULL "
+                    "WHERE id = ? AND status = 'running'",
+                    (job['id'],)
+                )
+            requeued += 1
+        if requeued:
+            logger.warning(f"Возвращено в очередь задач после сбоя воркеров: {requeued}")
+        return requeued
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+async def run_scrape(params: Dict, progress_callback: Optional[Callable[[int, int, str], None]] = None):
+    """Запуск скрапера с настройками из конфигурации"""
+    from config import Config
+    from dzen_scraper import DzenNewsScraper
+    from browser_identity import BrowserIdentityStore
+    from feed_publisher import FeedPublisher
+    from html_extract import HtmlExtractor
+    from proxy_pool import ProxyPool
+    from search_index import ArticleSearchIndex
+    from selector_stats import SelectorStats
+    from url_canonicalizer import UrlCanonicalizer
+
+    scraper = DzenNewsScraper()
+    scraper.progress_callback = progress_callback
+    # Файлы результатов - в каталог, который читают веб-интерфейс, поиск и фиды
+    scraper.output_dir = Path(Config.OUTPUT_DIR)
+    scraper.carryover_path = Path(Config.CARRYOVER_PATH)
+    scraper.seen_urls_path = Path(Config.SEEN_URLS_PATH)
+    scraper.url_canonicalizer = UrlCanonicalizer(
+        Config.CANONICAL_URLS_PATH,
+        resolve_redirects=Config.RESOLVE_REDIRECTS,
+        user_agent=scraper.user_agents[0]
+    )
+    # Альтернативы из конфигурации: каскад сам выясняет, какие из них еще работают
+    scraper.selectors = dict(Config.SELECTORS)
+    scraper.selector_stats = SelectorStats(Config.SELECTOR_STATS_PATH)
+    scraper.extraction_mode = Config.EXTRACTION_MODE
+    scraper.html_extractor = HtmlExtractor(workers=Config.EXTRACT_WORKERS)
+    scraper.identity_store = BrowserIdentityStore(
+        Config.BROWSER_STATE_DIR, Config.IDENTITY_MAX_AGE_HOURS
+    )
+    scraper.search_index = ArticleSearchIndex(Config.SEARCH_DB_PATH)
+    if Config.PUBLISH_FEEDS:
+        scraper.feed_publisher = FeedPublisher(
+            Config.FEEDS_DIR, results_dir=Config.OUTPUT_DIR,
+            base_url=Config.FEEDS_BASE_URL, hub_url=Config.WEBSUB_HUB_URL
+        )
+        # Подписчики /rss.xml веб-интерфейса тоже получают обновления через хаб
+        scraper.feed_publisher.extra_topics = {
+            name: [f'{Config.PUBLIC_BASE_URL}/rss.xml' + ('' if name == 'main' else f'?rubric={name}')]
+            for name in ['main', *Config.RUBRICS]
+        }
+    if Config.USE_PROXY and Config.PROXY_URLS:
+        scraper.proxy_pool = ProxyPool(
+            Config.PROXY_URLS,
+            max_pages_per_proxy=Config.MAX_PAGES_PER_PROXY,
+            cooldown_seconds=Config.PROXY_COOLDOWN
+        )
+
+    if params.get('profile'):
+        from profiling import RunProfiler
+
+        async with RunProfiler(Config.PROFILES_DIR, trace_slowest=Config.PROFILE_TRACE_SLOWEST) as profiler:
+            scraper.profiler = profiler
+            await _run_configured(scraper, params)
+    else:
+        await _run_configured(scraper, params)
+
+    return scraper
+
+
+async def _run_configured(scraper, params: Dict):
+    """Запуск подготовленного скрапера в обычном режиме или по рубрикам"""
+    from config import Config
+
+    max_articles = params.get('max_articles', Config.MAX_ARTICLES)
+    save_format = params.get('save_format', Config.SAVE_FORMAT)
+    time_budget = params.get('time_budget', Config.RUN_TIME_BUDGET)
+    # Параллельные страницы: сбор карточек рубрик и загрузка статей
+    scraper.max_concurrent_pages = Config.MAX_CONCURRENT_PAGES
+
+    if params.get('rubrics', Config.SCRAPE_RUBRICS):
+        await scraper.run_rubrics(
+            rubrics=Config.RUBRICS,
+            max_articles=max_articles,
+            save_format=save_format,
+            time_budget=time_budget
+        )
+    else:
+        await scraper.run_scraper(
+            max_articles=max_articles,
+            save_format=save_format,
+            time_budget=time_budget
+        )
+
+
+async def execute_job(queue: JobQueue, job: Dict, cancel_poll_interval: float = 2.0):
+    """Выполнение задачи с прогрессом и проверкой отмены"""
+    def report(done: int, total: int, message: str):
+        queue.update_progress(job['id'], done / total if total else 0.0, message)
+
+    task = asyncio.create_task(run_scrape(job['params'], report))
+    cancelled = False
+
+    while not task.done():
+        await asyncio.wait({task}, timeout=cancel_poll_interval)
+        # Отмена один раз: повторная прервала бы завершение скрапера (закрытие браузера, сохранение состояния)
+        if not cancelled and not task.done() and queue.is_cancel_requested(job['id']):
+            logger.info(f"Задача {job['id']} отменена")
+            task.cancel()
+            cancelled = True
+
+    try:
+        scraper = task.result()
+    except asyncio.CancelledError:
+        queue.finish(job['id'], 'cancelled')
+        return
+    except Exception as e:
+        logger.error(f"Ошибка выполнения задачи {job['id']}: {e}")
+        queue.finish(job['id'], 'failed', error=str(e))
+        return
+
+    result = {
+        'articles': len(scraper.collected_articles),
+        'carried_over': len(scraper.carried_over)
+    }
+    if scraper.collected_articles:
+        queue.finish(job['id'], 'done', result=result)
+    else:
+        queue.finish(job['id'], 'failed', result=result, error="Не удалось собрать статьи")
+
+
+async def run_inline(queue: JobQueue, source: str) -> int:
+    """Выполнение задач источника в текущем процессе, когда воркеры отключены (USE_JOB_QUEUE=false)
+
+    Задачи все равно проходят через очередь: статус, прогресс и отмена работают так же.
+    """
+    executed = 0
+    while True:
+        job = await asyncio.to_thread(queue.claim_next, source)
+        if job is None:
+            return executed
+        logger.info(f"Задача {job['id']} выполняется в процессе {os.getpid()}")
+        await execute_job(queue, job)
+        executed += 1
+
+
+def run_worker(db_path: str, poll_interval: float = 5.0):
+    """Основной цикл процесса-воркера"""
+    queue = JobQueue(db_path)
+    logger.info(f"Воркер {os.getpid()} запущен")
+
+    while True:
+        try:
+            job = queue.claim_next()
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            logger.info(f"Воркер {os.getpid()} выполняет задачу {job['id']}")
+            asyncio.run(execute_job(queue, job))
+
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            logger.error(f"Ошибка воркера: {e}")
+            time.sleep(poll_interval)
+
+
+def start_worker(db_path: str) -> multiprocessing.Process:
+    process = multiprocessing.Process(target=run_worker, args=(db_path,), daemon=True)
+    process.start()
+    return process
+
+
+def main():
+    """Запуск пула воркеров"""
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Воркеры очереди Dzen News Scraper")
+    parser.add_argument('--workers', type=int, default=Config.JOB_WORKERS,
+                        help="Количество процессов-воркеров")
+    parser.add_argument('--supervise-interval', type=float, default=30.0,
+                        help="Интервал проверки воркеров и зависших задач (с)")
+    args = parser.parse_args()
+
+    Config.create_directories()
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format=Config.LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(f'{Config.LOGS_DIR}/worker.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+    queue = JobQueue(Config.JOB_DB_PATH)
+    queue.requeue_orphaned()
+
+    processes = [start_worker(Config.JOB_DB_PATH) for _ in range(args.workers)]
+
+    try:
+        # Надзор: упавшие воркеры (например, убитые OOM) перезапускаются, их задачи
+        # возвращаются в очередь, а не остаются в статусе running
+        while True:
+            time.sleep(args.supervise_interval)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning(f"Воркер {process.pid} завершился (код {process.exitcode}), перезапуск")
+                    processes[i] = start_worker(Config.JOB_DB_PATH)
+            queue.requeue_orphaned()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал остановки. Завершение воркеров...")
+
+
+if __name__ == "__main__":
+    main()
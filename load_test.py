@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное тестирование веб-интерфейса Dzen News Scraper
+Генерирует синтетический OUTPUT_DIR, запускает admin_app локально и нагружает
+/rss.xml, /api/stats и /api/files с заданной интенсивностью
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+ADMIN_DIR = ROOT_DIR / 'temp'
+
+DEFAULT_ENDPOINTS = ['/rss.xml', '/api/stats', '/api/files']
+
+WORDS = (
+    'новости правительство экономика рынок компания рост снижение решение президент '
+    'министр регион москва технологии банк ставка цены закон проект заявление данные '
+    'эксперты россия мир страна город власти развитие отчет прогноз инвестиции'
+).split()
+
+
+def generate_output_dir(output_dir: Path, files: int, articles_per_file: int, seed: int):
+    """Генерация синтетических файлов результатов (детерминированно по seed)"""
+    rng = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    started = datetime(2024, 1, 1)
+
+    def sentence(words: int) -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    for file_index in range(files):
+        scraped_at = started + timedelta(minutes=30 * file_index)
+        articles = [
+            {
+                'title': sentence(8),
+                'url': f'https://dzen.ru/news/story/{file_index}-{article_index}',
+                'summary': sentence(30),
+                'content': ' '.join(sentence(15) for _ in range(20)),
+                'publish_date': scraped_at.isoformat(),
+                'scraped_at': scraped_at.isoformat(),
+                'content_length': 2000
+            }
+            for article_index in range(articles_per_file)
+        ]
+        filename = output_dir / f"dzen_news_{scraped_at.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(articles, f, ensure_ascii=False)
+
+
+def prepare_search_index(output_dir: Path, search_db: Path):
+    """Новый поисковый индекс для каждого прогона, построенный до нагрузки
+
+    Иначе admin_app индексирует архив в фоне во время замеров, а при повторном
+    --workdir индекс уже готов, и прогоны нельзя сравнивать.
+    """
+    sys.path.insert(0, str(ROOT_DIR))
+    from search_index import ArticleSearchIndex
+
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{search_db}{suffix}').unlink(missing_ok=True)
+    started = time.perf_counter()
+    indexed = ArticleSearchIndex(str(search_db)).sync_directory(output_dir)
+    print(f"Поисковый индекс: {indexed} статей за {time.perf_counter() - started:.1f} с")
+
+
+def start_admin(workdir: Path, port: int, search_db: Path) -> subprocess.Popen:
+    """Запуск admin_app в отдельном процессе на синтетических данных"""
+    env = dict(
+        os.environ,
+        OUTPUT_DIR=str(workdir / 'output'),
+        LOGS_DIR=str(workdir / 'logs'),
+        JOB_DB_PATH=str(workdir / 'queue' / 'jobs.db'),
+        SEARCH_DB_PATH=str(search_db),
+        # Индекс уже построен: фоновая индексация при старте не должна попасть в замеры
+        SEARCH_SYNC_ON_STARTUP='false',
+        PYTHONPATH=os.pathsep.join([str(ROOT_DIR), os.environ.get('PYTHONPATH', '')])
+    )
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'admin_app:app', '--app-dir', str(ADMIN_DIR),
+         '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=workdir,
+        env=env
+    )
+
+
+async def http_get(port: int, path: str, timeout: float = 30.0) -> int:
+    """Минимальный HTTP/1.1 GET без внешних зависимостей, возвращает статус"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    status_line = response.split(b'\r\n', 1)[0].split()
+    return int(status_line[1]) if len(status_line) > 1 else 0
+
+
+async def wait_ready(port: int, timeout: float = 60.0):
+    """Ожидание готовности сервера"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if await http_get(port, '/api/loop-lag', timeout=5) == 200:
+                return
+        except (OSError, asyncio.TimeoutError):
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("admin_app не запустился")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run_endpoint(port: int, path: str, rate: float, duration: float, concurrency: int) -> Dict:
+    """Нагрузка одного эндпоинта с постоянной интенсивностью (открытая модель)"""
+    await http_get(port, '/api/loop-lag?reset=true')
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    ok = 0
+    errors = 0
+    queued = 0
+
+    async def one_request():
+        nonlocal ok, errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status = await http_get(port, path)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+            if status == 200:
+                ok += 1
+            else:
+                errors += 1
+
+    total = int(rate * duration)
+    started = time.perf_counter()
+    tasks = []
+    for index in range(total):
+        # Запросы отправляются по расписанию, независимо от скорости ответов
+        delay = started + index / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if semaphore.locked():
+            queued += 1
+        tasks.append(asyncio.create_task(one_request()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    lag_status, lag = await fetch_json(port, '/api/loop-lag')
+
+    return {
+        'endpoint': path,
+        'requests': total,
+        'ok': ok,
+        'errors': errors,
+        'queued_over_concurrency': queued,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p90': round(percentile(latencies, 0.90) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(max(latencies, default=0.0) * 1000, 2)
+        },
+        'loop_lag_ms': lag if lag_status == 200 else None
+    }
+
+
+async def fetch_json(port: int, path: str):
+    """GET с разбором JSON-тела"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    if b'chunked' in head.lower():
+        body = dechunk(body)
+    return status, json.loads(body) if status == 200 else None
+
+
+def dechunk(body: bytes) -> bytes:
+    """Сборка тела с Transfer-Encoding: chunked"""
+    result = b''
+    while body:
+        size_line, _, body = body.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if size == 0:
+            break
+        result += body[:size]
+        body = body[size + 2:]
+    return result
+
+
+def print_report(results: List[Dict], previous: Optional[Dict] = None):
+    """Вывод результатов с разницей относительно предыдущего прогона"""
+    previous_by_endpoint = {item['endpoint']: item for item in (previous or {}).get('results', [])}
+
+    print(f"\n{'Эндпоинт':<14}{'RPS':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'ошибки':>8}{'lag p99':>9}{'lag max':>9}")
+    for item in results:
+        latency = item['latency_ms']
+        lag = item['loop_lag_ms'] or {}
+        print(
+            f"{item['endpoint']:<14}{item['throughput_rps']:>9}{latency['p50']:>9}{latency['p90']:>9}"
+            f"{latency['p99']:>9}{latency['max']:>9}{item['errors']:>8}"
+            f"{lag.get('p99_ms', '-'):>9}{lag.get('max_ms', '-'):>9}"
+        )
+
+        before = previous_by_endpoint.get(item['endpoint'])
+        if before:
+            delta_p99 = latency['p99'] - before['latency_ms']['p99']
+            delta_rps = item['throughput_rps'] - before['throughput_rps']
+            print(f"{'':<14}  изменение: p99 {delta_p99:+.2f} мс, RPS {delta_rps:+.2f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование admin_app")
+    parser.add_argument('--files', type=int, default=1000, help="Количество файлов в OUTPUT_DIR")
+    parser.add_argument('--articles', type=int, default=20, help="Статей в каждом файле")
+    parser.add_argument('--rate', type=float, default=20.0, help="Запросов в секунду на эндпоинт")
+    parser.add_argument('--duration', type=float, default=15.0, help="Длительность нагрузки на эндпоинт (с)")
+    parser.add_argument('--concurrency', type=int, default=200, help="Максимум одновременных запросов")
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=42, help="Seed генерации данных")
+    parser.add_argument('--workdir', help="Каталог данных (по умолчанию временный)")
+    parser.add_argument('--output', help="Сохранить результаты в JSON")
+    parser.add_argument('--compare', help="Сравнить с результатами предыдущего прогона")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='dzen_load_'))
+    output_dir = workdir / 'output'
+
+    if not any(output_dir.glob('dzen_news_*.json')):
+        print(f"Генерация {args.files} файлов по {args.articles} статей в {output_dir}...")
+        generate_output_dir(output_dir, args.files, args.articles, args.seed)
+
+    search_db = workdir / 'queue' / 'search.db'
+    prepare_search_index(output_dir, search_db)
+
+    server = start_admin(workdir, args.port, search_db)
+    try:
+        await wait_ready(args.port)
+        results = []
+        for endpoint in args.endpoints:
+            print(f"Нагрузка {endpoint}: {args.rate} RPS, {args.duration} с...")
+            results.append(await run_endpoint(args.port, endpoint, args.rate, args.duration, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'config': {
+            'files': args.files,
+            'articles': args.articles,
+            'rate': args.rate,
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""
+Профилирование запусков Dzen News Scraper
+CPU-профиль (cProfile), топ аллокаций (tracemalloc), обнаружение зависаний
+event loop и трассировки Playwright для самых медленных страниц
+"""
+
+import asyncio
+import cProfile
+import heapq
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunProfiler:
+    """Профилировщик одного запуска, результаты пишутся в отдельный каталог"""
+
+    def __init__(self, profiles_dir: str, trace_slowest: int = 3, stall_threshold: float = 0.25,
+                 top_allocations: int = 30, top_functions: int = 50):
+        self.profiles_dir = Path(profiles_dir)
+        self.trace_slowest = trace_slowest
+        self.stall_threshold = stall_threshold
+        self.top_allocations = top_allocations
+        self.top_functions = top_functions
+
+        self.run_dir: Optional[Path] = None
+        self.stalls: List[Dict] = []
+        self._profile = cProfile.Profile()
+        self._started = 0.0
+        self._last_tick = 0.0
+        self._stop_event = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._loop_thread_id = 0
+
+        # Трассировки: контексты с включенной трассировкой, открытые фрагменты
+        # (начало, URL) и (длительность, путь, URL) самых медленных страниц
+        self._traced_contexts = set()
+        self._chunk_started: Dict[int, Tuple[float, str]] = {}
+        self._traces: List = []
+        self._trace_counter = 0
+
+    async def __aenter__(self) -> 'RunProfiler':
+        self.run_dir = self.profiles_dir / datetime.now().strftime('%Y%m%d_%H%M%S')
+        (self.run_dir / 'traces').mkdir(parents=True, exist_ok=True)
+
+        self._started = time.monotonic()
+        tracemalloc.start(25)
+        self._profile.enable()
+
+        # Event loop отмечается каждые 50 мс, сторожевой поток ловит пропуски
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._ticker = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+
+        logger.info(f"Профилирование запуска: {self.run_dir}")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        self._stop_event.set()
+        self._ticker.cancel()
+        self._watchdog.join(timeout=1)
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        await asyncio.to_thread(self._write_results, snapshot, current, peak)
+        logger.info(f"Результаты профилирования сохранены в {self.run_dir}")
+        return False
+
+    async def _tick(self):
+        while True:
+            self._last_tick = time.monotonic()
+            await asyncio.sleep(0.05)
+
+    def _watch(self):
+        """Сторожевой поток: фиксирует стек event loop, если тот не отвечает"""
+        reported_tick = None
+        while not self._stop_event.wait(self.stall_threshold / 2):
+            last_tick = self._last_tick
+            stalled_for = time.monotonic() - last_tick
+            if stalled_for < self.stall_threshold:
+                continue
+            if last_tick == reported_tick:
+                # Зависание продолжается - обновляем длительность
+                self.stalls[-1]['stalled_ms'] = round(stalled_for * 1000, 1)
+                continue
+
+            reported_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            self.stalls.append({
+                'at_seconds': round(last_tick - self._started, 3),
+                'stalled_ms': round(stalled_for * 1000, 1),
+                'stack': traceback.format_stack(frame) if frame else []
+            })
+
+    def _write_results(self, snapshot, current: int, peak: int):
+        self._profile.dump_stats(str(self.run_dir / 'cpu.prof'))
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(self.top_functions)
+        (self.run_dir / 'cpu_top.txt').write_text(stream.getvalue(), encoding='utf-8')
+
+        top_stats = snapshot.statistics('lineno')[:self.top_allocations]
+        lines = [f"Текущая память: {current / 1024 / 1024:.1f} МБ, пик: {peak / 1024 / 1024:.1f} МБ", ""]
+        lines.extend(str(stat) for stat in top_stats)
+        (self.run_dir / 'memory_top.txt').write_text('\n'.join(lines), encoding='utf-8')
+
+        with open(self.run_dir / 'stalls.json', 'w', encoding='utf-8') as f:
+            json.dump(self.stalls, f, ensure_ascii=False, indent=2)
+
+        summary = {
+            'started_at': self.run_dir.name,
+            'duration_seconds': round(time.monotonic() - self._started, 2),
+            'memory_peak_mb': round(peak / 1024 / 1024, 1),
+            'stalls': len(self.stalls),
+            'max_stall_ms': max((stall['stalled_ms'] for stall in self.stalls), default=0.0),
+            'traces': [
+                {'file': Path(path).name, 'seconds': round(seconds, 2), 'url': url}
+                for seconds, path, url in sorted(self._traces, reverse=True)
+            ]
+        }
+        with open(self.run_dir / 'summary.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    async def start_trace(self, context):
+        """Включение трассировки контекста Playwright; запись идет фрагментами по страницам"""
+        if not self.trace_slowest:
+            return
+        await context.tracing.start(screenshots=True, snapshots=True)
+        # start() открывает первый фрагмент - отбрасываем его, фрагменты начинаются с переходов
+        await context.tracing.stop_chunk()
+        self._traced_contexts.add(id(context))
+
+    async def start_chunk(self, context, url: str):
+        """Новый фрагмент трассировки для перехода на страницу (предыдущий завершается)"""
+        if id(context) not in self._traced_contexts:
+            return
+        await self.stop_chunk(context)
+        await context.tracing.start_chunk(title=url)
+        self._chunk_started[id(context)] = (time.monotonic(), url)
+
+    async def stop_chunk(self, context):
+        """Завершение фрагмента: сохраняются только самые медленные страницы"""
+        chunk = self._chunk_started.pop(id(context), None)
+        if chunk is None:
+            return
+
+        started, url = chunk
+        seconds = time.monotonic() - started
+        if len(self._traces) >= self.trace_slowest and seconds <= self._traces[0][0]:
+            await context.tracing.stop_chunk()
+            return
+
+        self._trace_counter += 1
+        path = str(self.run_dir / 'traces' / f'trace_{self._trace_counter:03d}.zip')
+        await context.tracing.stop_chunk(path=path)
+
+        heapq.heappush(self._traces, (seconds, path, url))
+        if len(self._traces) > self.trace_slowest:
+            _, evicted_path, _ = heapq.heappop(self._traces)
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+    async def stop_trace(self, context):
+        """Завершение трассировки контекста перед его закрытием"""
+        if id(context) not in self._traced_contexts:
+            return
+        await self.stop_chunk(context)
+        self._traced_contexts.discard(id(context))
+        await context.tracing.stop()
+
+
+def list_profiles(profiles_dir: str, limit: int = 50) -> List[Dict]:
+    """Список сохраненных профилей запусков (новые первыми)"""
+    profiles = []
+    base = Path(profiles_dir)
+    if not base.exists():
+        return profiles
+
+    for run_dir in sorted((p for p in base.iterdir() if p.is_dir()), reverse=True)[:limit]:
+        summary = {}
+        try:
+            with open(run_dir / 'summary.json', 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        profiles.append({
+            'name': run_dir.name,
+            'summary': summary,
+            'files': sorted(
+                str(path.relative_to(run_dir)) for path in run_dir.rglob('*') if path.is_file()
+            )
+        })
+    return profiles
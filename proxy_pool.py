@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Пул прокси для Dzen News Scraper
+Назначает прокси контекстам браузера, отслеживает задержки и ошибки,
+выводит плохие прокси на паузу или исключает их и ограничивает число страниц на прокси
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyPool:
+    """Пул прокси с оценкой здоровья и ограничением параллельных страниц"""
+
+    def __init__(self, proxy_urls: List[str], max_pages_per_proxy: int = 2,
+                 max_consecutive_errors: int = 3, cooldown_seconds: float = 300.0,
+                 max_error_rate: float = 0.5, min_samples: int = 10):
+        self.max_pages_per_proxy = max_pages_per_proxy
+        self.max_consecutive_errors = max_consecutive_errors
+        self.cooldown_seconds = cooldown_seconds
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+
+        self.proxies: List[Dict] = [self._new_proxy(url) for url in proxy_urls if url.strip()]
+        self._condition = asyncio.Condition()
+
+    def _new_proxy(self, url: str) -> Dict:
+        parsed = urlparse(url.strip())
+        return {
+            'url': url.strip(),
+            'server': f"{parsed.scheme or 'http'}://{parsed.hostname}:{parsed.port or 8080}",
+            'username': parsed.username or '',
+            'password': parsed.password or '',
+            'active': 0,
+            'requests': 0,
+            'errors': 0,
+            'consecutive_errors': 0,
+            'latency': None,
+            'cooldowns': 0,
+            'cooldown_until': 0.0,
+            'evicted': False
+        }
+
+    def error_rate(self, proxy: Dict) -> float:
+        return proxy['errors'] / proxy['requests'] if proxy['requests'] else 0.0
+
+    def score(self, proxy: Dict) -> float:
+        """Оценка прокси: меньше - лучше"""
+        latency = proxy['latency'] if proxy['latency'] is not None else 1.0
+        return latency * (1 + 4 * self.error_rate(proxy)) * (1 + proxy['active'])
+
+    def _available(self, now: float) -> List[Dict]:
+        return [
+            proxy for proxy in self.proxies
+            if not proxy['evicted']
+            and proxy['cooldown_until'] <= now
+            and proxy['active'] < self.max_pages_per_proxy
+        ]
+
+    async def acquire(self, timeout: float = 60.0) -> Optional[Dict]:
+        """Выбор лучшего свободного прокси; None, если живых прокси не осталось"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        async with self._condition:
+            while True:
+                if all(proxy['evicted'] for proxy in self.proxies):
+                    return None
+
+                now = time.time()
+                available = self._available(now)
+                if available:
+                    proxy = min(available, key=self.score)
+                    proxy['active'] += 1
+                    return proxy
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Нет свободных прокси")
+
+                # Ждем освобождения прокси или окончания ближайшей паузы
+                cooldowns = [
+                    proxy['cooldown_until'] - now for proxy in self.proxies
+                    if not proxy['evicted'] and proxy['cooldown_until'] > now
+                ]
+                wait = min([remaining] + [max(c, 0.1) for c in cooldowns])
+                try:
+                    await asyncio.wait_for(self._condition.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, proxy: Dict):
+        """Освобождение прокси после закрытия контекста"""
+        async with self._condition:
+            proxy['active'] = max(proxy['active'] - 1, 0)
+            self._condition.notify_all()
+
+    def record(self, proxy: Dict, ok: bool, latency: Optional[float] = None):
+        """Учет результата запроса через прокси"""
+        proxy['requests'] += 1
+
+        if ok:
+            proxy['consecutive_errors'] = 0
+            if latency is not None:
+                # Экспоненциальное сглаживание задержки
+                proxy['latency'] = latency if proxy['latency'] is None else 0.7 * proxy['latency'] + 0.3 * latency
+            return
+
+        proxy['errors'] += 1
+        proxy['consecutive_errors'] += 1
+
+        if proxy['requests'] >= self.min_samples and self.error_rate(proxy) > self.max_error_rate:
+            proxy['evicted'] = True
+            logger.warning(f"Прокси {proxy['server']} исключен: доля ошибок {self.error_rate(proxy):.0%}")
+        elif proxy['consecutive_errors'] >= self.max_consecutive_errors:
+            # Пауза растет с каждым повтором
+            proxy['cooldowns'] += 1
+            pause = self.cooldown_seconds * 2 ** (proxy['cooldowns'] - 1)
+            proxy['cooldown_until'] = time.time() + pause
+            proxy['consecutive_errors'] = 0
+            logger.warning(f"Прокси {proxy['server']} на паузе {pause:.0f} с после серии ошибок")
+
+    def playwright_proxy(self, proxy: Dict) -> Dict:
+        """Настройки прокси для контекста Playwright"""
+        settings = {'server': proxy['server']}
+        if proxy['username']:
+            settings['username'] = proxy['username']
+            settings['password'] = proxy['password']
+        return settings
+
+    async def probe(self, proxy: Dict, target: str = 'dzen.ru:443', timeout: float = 10.0) -> bool:
+        """Проверка прокси запросом CONNECT к целевому хосту"""
+        parsed = urlparse(proxy['server'])
+        started = time.monotonic()
+        writer = None
+
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parsed.hostname, parsed.port), timeout
+            )
+            request = f"CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n"
+            if proxy['username']:
+                credentials = base64.b64encode(f"{proxy['username']}:{proxy['password']}".encode()).decode()
+                request += f"Proxy-Authorization: Basic {credentials}\r\n"
+            writer.write(f"{request}\r\n".encode())
+            await writer.drain()
+
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            ok = b' 200' in status_line
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"Прокси {proxy['server']} недоступен: {e}")
+            ok = False
+        finally:
+            if writer:
+                writer.close()
+
+        self.record(proxy, ok, time.monotonic() - started)
+        return ok
+
+    async def probe_all(self, target: str = 'dzen.ru:443') -> Dict[str, bool]:
+        """Проверка всех прокси пула"""
+        results = await asyncio.gather(*(self.probe(proxy, target) for proxy in self.proxies))
+        return {proxy['server']: ok for proxy, ok in zip(self.proxies, results)}
+
+    def get_stats(self) -> List[Dict]:
+        """Статистика здоровья прокси"""
+        now = time.time()
+        return [
+            {
+                'server': proxy['server'],
+                'active': proxy['active'],
+                'requests': proxy['requests'],
+                'error_rate': round(self.error_rate(proxy), 3),
+                'latency': round(proxy['latency'], 3) if proxy['latency'] is not None else None,
+                'cooling_down': proxy['cooldown_until'] > now,
+                'evicted': proxy['evicted']
+            }
+            for proxy in self.proxies
+        ]
+
+    def log_stats(self):
+        """Вывод статистики прокси в лог"""
+        for item in self.get_stats():
+            state = 'исключен' if item['evicted'] else 'пауза' if item['cooling_down'] else 'активен'
+            logger.info(
+                f"Прокси {item['server']}: {state}, запросов {item['requests']}, "
+                f"ошибок {item['error_rate']:.0%}, задержка {item['latency']} с"
+            )
+
+
+async def run_stand_in_proxy(mode: str = 'ok', port: int = 0, delay: float = 0.0) -> asyncio.AbstractServer:
+    """Локальный CONNECT-прокси для проверки пула без настоящих прокси
+
+    mode: ok - туннель к целевому хосту, fail - ответ 502, drop - обрыв соединения;
+    delay добавляет задержку перед ответом.
+    """
+    async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            await asyncio.sleep(delay)
+
+            if mode == 'drop':
+                return
+            if mode == 'fail':
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+                return
+
+            host, _, port_str = request_line.split()[1].decode().rpartition(':')
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(host, int(port_str))
+            except OSError:
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+                return
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            await writer.drain()
+            await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+        except (OSError, ValueError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', port)
+
+
+async def check_pool() -> bool:
+    """Проверка оценки, паузы и исключения на локальных прокси: рабочем и отказывающем"""
+    # Целевой хост проверки: принимает соединения и сразу их закрывает
+    target = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+    good = await run_stand_in_proxy('ok')
+    bad = await run_stand_in_proxy('fail')
+    target_address = f"127.0.0.1:{target.sockets[0].getsockname()[1]}"
+
+    pool = ProxyPool(
+        [f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}" for server in (good, bad)],
+        max_pages_per_proxy=1, max_consecutive_errors=3, cooldown_seconds=60.0, min_samples=6
+    )
+    good_proxy, bad_proxy = pool.proxies
+    checks = []
+
+    try:
+        for _ in range(pool.max_consecutive_errors):
+            await pool.probe_all(target_address)
+        checks.append(("отказывающий прокси на паузе", bad_proxy['cooldown_until'] > time.time()))
+        checks.append(("рабочий прокси активен", good_proxy['cooldown_until'] == 0.0))
+
+        proxy = await pool.acquire(timeout=1.0)
+        checks.append(("выбран рабочий прокси", proxy is good_proxy))
+        await pool.release(proxy)
+
+        while bad_proxy['requests'] < pool.min_samples:
+            await pool.probe(bad_proxy, target_address)
+        checks.append(("отказывающий прокси исключен", bad_proxy['evicted']))
+
+        good_proxy['evicted'] = True
+        checks.append(("без живых прокси acquire возвращает None", await pool.acquire(timeout=1.0) is None))
+    finally:
+        for server in (target, good, bad):
+            server.close()
+            await server.wait_closed()
+
+    for name, ok in checks:
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    pool.log_stats()
+    return all(ok for _, ok in checks)
+
+
+async def main():
+    """Проверка прокси из конфигурации и утилиты для локальной проверки пула"""
+    parser = argparse.ArgumentParser(description="Пул прокси Dzen News Scraper")
+    parser.add_argument('command', nargs='?', default='probe', choices=['probe', 'check', 'stand-in'],
+                        help="probe - проверить прокси из PROXY_URLS, check - проверить пул на локальных "
+                             "прокси, stand-in - запустить локальный прокси")
+    parser.add_argument('--mode', default='ok', choices=['ok', 'fail', 'drop'], help="Поведение локального прокси")
+    parser.add_argument('--port', type=int, default=0, help="Порт локального прокси")
+    parser.add_argument('--delay', type=float, default=0.0, help="Задержка ответа локального прокси (с)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'check':
+        sys.exit(0 if await check_pool() else 1)
+    if args.command == 'stand-in':
+        server = await run_stand_in_proxy(args.mode, args.port, args.delay)
+        print(f"Локальный прокси ({args.mode}): http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    from config import Config
+
+    pool = ProxyPool(Config.PROXY_URLS, Config.MAX_PAGES_PER_PROXY)
+    results = await pool.probe_all()
+    for server, ok in results.items():
+        print(f"{server}: {'OK' if ok else 'FAIL'}")
+    pool.log_stats()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
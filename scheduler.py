@@ -4,57 +4,65 @@
 Запускает скрапинг по расписанию
 """
 
+import argparse
 import asyncio
 import logging
 import schedule
 import time
 from datetime import datetime
-from dzen_scraper import DzenNewsScraper
 from config import Config
+from job_queue import JobQueue, PRIORITY_SCHEDULED, run_inline
 
-# Настройка логирования
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format=Config.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(f'{Config.LOGS_DIR}/scheduler.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging():
+    """Настройка логирования при запуске планировщика (не при импорте)"""
+    Config.create_directories()
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format=Config.LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(f'{Config.LOGS_DIR}/scheduler.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
 class NewsScraperScheduler:
-    def __init__(self):
-        self.scraper = None
-        self.is_running = False
+    def __init__(self, profile: bool = False):
+        self.job_params = {'profile': True} if profile else {}
         
     async def run_scraper_job(self):
-        """Задача для планировщика"""
-        if self.is_running:
-            logger.warning("Скрапер уже выполняется. Пропускаем задачу.")
-            return
-            
-        self.is_running = True
+        """Выполнение плановых задач в процессе планировщика, когда воркеры отключены"""
         logger.info("Запуск планированного скрапинга...")
         
         try:
-            scraper = DzenNewsScraper()
-            await scraper.run_scraper(
-                max_articles=Config.MAX_ARTICLES,
-                save_format=Config.SAVE_FORMAT
-            )
-            logger.info("Планированный скрапинг завершен успешно")
+            queue = JobQueue(Config.JOB_DB_PATH)
+            # Задачи прошлого процесса планировщика, прерванные на середине
+            await asyncio.to_thread(queue.requeue_orphaned, 'schedule')
+            await run_inline(queue, 'schedule')
+            logger.info("Планированный скрапинг завершен")
             
         except Exception as e:
             logger.error(f"Ошибка при выполнении планированного скрапинга: {e}")
+    
+    def enqueue_job(self):
+        """Постановка планового запуска в общую очередь задач"""
+        queue = JobQueue(Config.JOB_DB_PATH)
+        
+        # Плановые запуски не копятся: достаточно одного ожидающего или выполняющегося
+        if queue.has_active('schedule'):
+            logger.warning("Плановая задача уже в очереди. Пропускаем.")
+            return
         
-        finally:
-            self.is_running = False
+        queue.enqueue('scrape', self.job_params, priority=PRIORITY_SCHEDULED, source='schedule')
     
     def schedule_job(self):
-        """Синхронная обертка для асинхронной задачи"""
-        asyncio.run(self.run_scraper_job())
+        """Плановый запуск: задача в общей очереди, без воркеров - выполнение здесь же"""
+        self.enqueue_job()
+        if not Config.USE_JOB_QUEUE:
+            asyncio.run(self.run_scraper_job())
     
     def setup_schedule(self):
         """Настройка расписания"""
@@ -93,7 +101,13 @@ class NewsScraperScheduler:
 
 def main():
     """Основная функция"""
-    scheduler = NewsScraperScheduler()
+    parser = argparse.ArgumentParser(description="Планировщик Dzen News Scraper")
+    parser.add_argument('--profile', action='store_true',
+                        help="Профилировать каждый запуск (результаты в PROFILES_DIR)")
+    args = parser.parse_args()
+    setup_logging()
+    
+    scheduler = NewsScraperScheduler(profile=args.profile)
     
     # Запуск немедленно при старте
     logger.info("Выполняем первоначальный скрапинг...")
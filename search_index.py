@@ -0,0 +1,260 @@
+"""
+Полнотекстовый поиск по собранным статьям Dzen News Scraper
+Инкрементальный индекс SQLite FTS5 по заголовку, описанию и тексту
+со стеммингом русского языка
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import snowballstemmer
+    _stemmer = snowballstemmer.stemmer('russian')
+except ImportError:
+    _stemmer = None
+
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Упрощенный стемминг, если snowballstemmer не установлен: отсекаем окончания
+RUSSIAN_ENDINGS = sorted([
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'иях', 'ость', 'ости',
+    'ать', 'ять', 'ить', 'еть', 'ует', 'ают', 'яют', 'ился', 'ась', 'ись', 'ешь',
+    'ах', 'ях', 'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ам', 'ям', 'ом', 'ем', 'их', 'ых', 'ую', 'юю', 'ию', 'ия', 'ие', 'ии',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'
+], key=len, reverse=True)
+
+
+def stem_word(word: str) -> str:
+    """Приведение слова к основе"""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word):
+        return word
+    if _stemmer:
+        return _stemmer.stemWord(word)
+
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text: str) -> str:
+    """Текст в виде последовательности основ для индекса"""
+    return ' '.join(stem_word(word) for word in WORD_RE.findall(text or ''))
+
+
+class ArticleSearchIndex:
+    """Инкрементальный полнотекстовый индекс статей на SQLite FTS5"""
+
+    # Веса колонок при ранжировании: заголовок, описание, текст
+    RANK_WEIGHTS = (10.0, 4.0, 1.0)
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL DEFAULT '',
+                    summary TEXT NOT NULL DEFAULT '',
+                    content TEXT NOT NULL DEFAULT '',
+                    publish_date TEXT NOT NULL DEFAULT '',
+                    scraped_at TEXT NOT NULL DEFAULT '',
+                    rubric TEXT NOT NULL DEFAULT '',
+                    source_file TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS articles_scraped_at ON articles (scraped_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                    title, summary, content, tokenize = 'unicode61 remove_diacritics 2'
+                );
+                CREATE TABLE IF NOT EXISTS indexed_files (
+                    name TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL
+                );
+            """)
+            self._initialized = True
+
+        return conn
+
+    def index_articles(self, articles: Iterable[Dict], source_file: str = '') -> int:
+        """Добавление или обновление статей в индексе без полной перестройки"""
+        indexed = 0
+        with closing(self._connect()) as conn, conn:
+            for article in articles:
+                url = article.get('url')
+                if not url:
+                    continue
+
+                values = (
+                    article.get('title') or '',
+                    article.get('summary') or '',
+                    article.get('content') or '',
+                    article.get('publish_date') or '',
+                    article.get('scraped_at') or '',
+                    article.get('rubric') or '',
+                    source_file
+                )
+                row = conn.execute("SELECT id FROM articles WHERE url = ?", (url,)).fetchone()
+                if row:
+                    article_id = row['id']
+                    conn.execute(
+                        "UPDATE articles SET title = ?, summary = ?, content = ?, publish_date = ?, "
+                        "scraped_at = ?, rubric = ?, source_file = ? WHERE id = ?",
+                        values + (article_id,)
+                    )
+                    conn.execute("DELETE FROM articles_fts WHERE rowid = ?", (article_id,))
+                else:
+                    article_id = conn.execute(
+                        "INSERT INTO articles (url, title, summary, content, publish_date, "
+                        "scraped_at, rubric, source_file) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url,) + values
+                    ).lastrowid
+
+                conn.execute(
+                    "INSERT INTO articles_fts (rowid, title, summary, content) VALUES (?, ?, ?, ?)",
+                    (article_id, stem_text(values[0]), stem_text(values[1]), stem_text(values[2]))
+                )
+                indexed += 1
+
+        return indexed
+
+    def index_file(self, file_path: Path) -> int:
+        """Индексация одного файла результатов"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {file_path} для индексации: {e}")
+            return 0
+
+        indexed = self.index_articles(data if isinstance(data, list) else [data], file_path.name)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_files (name, mtime) VALUES (?, ?)",
+                (file_path.name, file_path.stat().st_mtime)
+            )
+        return indexed
+
+    def sync_directory(self, directory: Path, pattern: str = 'dzen_news_*.json') -> int:
+        """Индексация новых и измененных файлов каталога результатов"""
+        with closing(self._connect()) as conn:
+            known = {row['name']: row['mtime'] for row in conn.execute("SELECT name, mtime FROM indexed_files")}
+
+        indexed = 0
+        for file_path in sorted(Path(directory).glob(pattern)):
+            if known.get(file_path.name) != file_path.stat().st_mtime:
+                indexed += self.index_file(file_path)
+
+        if indexed:
+            logger.info(f"Проиндексировано статей: {indexed}")
+        return indexed
+
+    def build_match_query(self, query: str) -> str:
+        """Перевод пользовательского запроса в выражение FTS5: слова, "фразы" и префиксы*"""
+        parts = []
+        for phrase, term in QUERY_RE.findall(query):
+            if phrase:
+                stems = [stem_word(word) for word in WORD_RE.findall(phrase)]
+                if stems:
+                    parts.append('"' + ' '.join(stems) + '"')
+            else:
+                words = WORD_RE.findall(term)
+                if not words:
+                    continue
+                stems = ' '.join(stem_word(word) for word in words)
+                parts.append(f'"{stems}"*' if term.endswith('*') else f'"{stems}"')
+        return ' AND '.join(parts)
+
+    def search(self, query: str, date_from: Optional[str] = None, date_to: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Dict:
+        """Поиск статей с ранжированием по релевантности и фильтром по дате сбора"""
+        started = time.perf_counter()
+        match = self.build_match_query(query)
+        if not match:
+            return {"query": query, "total": 0, "results": [], "took_ms": 0.0}
+
+        conditions = ["articles_fts MATCH ?"]
+        args: list = [match]
+        if date_from:
+            conditions.append("a.scraped_at >= ?")
+            args.append(date_from)
+        if date_to:
+            # Дата без времени включает весь день
+            conditions.append("a.scraped_at <= ?")
+            args.append(f"{date_to}T23:59:59.999999" if len(date_to) == 10 else date_to)
+        where = ' AND '.join(conditions)
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid WHERE {where}",
+                args
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT a.*, bm25(articles_fts, ?, ?, ?) AS score "
+                f"FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                f"WHERE {where} ORDER BY score LIMIT ? OFFSET ?",
+                list(self.RANK_WEIGHTS) + args + [limit, offset]
+            ).fetchall()
+
+        stems = {stem_word(word) for word in WORD_RE.findall(query)}
+        results = [
+            {
+                "url": row['url'],
+                "title": row['title'],
+                "summary": row['summary'],
+                "snippet": self.make_snippet(row['content'] or row['summary'], stems),
+                "publish_date": row['publish_date'],
+                "scraped_at": row['scraped_at'],
+                "rubric": row['rubric'],
+                "source_file": row['source_file'],
+                "score": round(-row['score'], 4)
+            }
+            for row in rows
+        ]
+
+        return {
+            "query": query,
+            "total": total,
+            "results": results,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def make_snippet(self, text: str, stems: set, width: int = 200) -> str:
+        """Фрагмент исходного текста вокруг первого совпадения"""
+        for match in WORD_RE.finditer(text or ''):
+            if stem_word(match.group()) in stems:
+                start = max(match.start() - width // 2, 0)
+                snippet = text[start:start + width].strip()
+                return ('...' if start else '') + snippet + ('...' if start + width < len(text) else '')
+        return (text or '')[:width]
+
+    def get_stats(self) -> Dict:
+        """Размер индекса"""
+        with closing(self._connect()) as conn:
+            return {
+                "articles": conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0],
+                "files": conn.execute("SELECT COUNT(*) FROM indexed_files").fetchone()[0]
+            }
@@ -0,0 +1,192 @@
+"""
+Статистика CSS-селекторов Dzen News Scraper
+Учитывает срабатывания каждой альтернативы каскада по доменам и запускам,
+упорядочивает каскад по успешности и находит «мертвые» селекторы
+"""
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+
+def split_selector(selector: str) -> List[str]:
+    """Разбиение списка селекторов через запятую без учета запятых в скобках и кавычках"""
+    parts = []
+    depth = 0
+    quote = ''
+    current = ''
+    for char in selector:
+        if quote:
+            quote = '' if char == quote else quote
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        current += char
+    parts.append(current.strip())
+    return [part for part in parts if part]
+
+
+class SelectorStats:
+    """Профиль селекторов по доменам: попадания и попытки каждой альтернативы"""
+
+    def __init__(self, stats_path: str, probe_every: int = 20, dead_after: int = 50, keep_runs: int = 20):
+        self.stats_path = Path(stats_path)
+        # Каждый N-й запрос проверяет все альтернативы, чтобы статистика была у всех
+        self.probe_every = probe_every
+        self.dead_after = dead_after
+        self.keep_runs = keep_runs
+
+        # домен -> ключ селектора -> альтернатива -> {'hits', 'attempts', 'last_hit'}
+        self.totals: Dict[str, Dict[str, Dict[str, Dict]]] = {}
+        self.runs: List[Dict] = []
+        self.run: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+        self.queries: Dict[str, int] = {}
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.totals = data.get('domains', {})
+        self.runs = data.get('runs', [])
+
+    def save(self):
+        """Сохранение профиля с добавлением статистики текущего запуска"""
+        if not self.run:
+            return
+        if not self.loaded:
+            self.load()
+        now = datetime.now().isoformat()
+        for domain, keys in self.run.items():
+            for key, alternatives in keys.items():
+                for alternative, (hits, attempts) in alternatives.items():
+                    entry = self.totals.setdefault(domain, {}).setdefault(key, {}).setdefault(
+                        alternative, {'hits': 0, 'attempts': 0, 'last_hit': None}
+                    )
+                    entry['hits'] += hits
+                    entry['attempts'] += attempts
+                    if hits:
+                        entry['last_hit'] = now
+
+        self.runs = (self.runs + [{'finished_at': now, 'domains': self.run}])[-self.keep_runs:]
+        try:
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.stats_path, 'w', encoding='utf-8') as f:
+                json.dump({'domains': self.totals, 'runs': self.runs}, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить статистику селекторов: {e}")
+        self.run = {}
+
+    def _history(self, domain: str, key: str) -> Dict[str, Dict]:
+        """История ключа для домена; для нового домена - сумма по всем доменам"""
+        if not self.loaded:
+            self.load()
+        history = self.totals.get(domain, {}).get(key)
+        if history:
+            return history
+
+        combined: Dict[str, Dict] = {}
+        for keys in self.totals.values():
+            for alternative, entry in keys.get(key, {}).items():
+                total = combined.setdefault(alternative, {'hits': 0, 'attempts': 0})
+                total['hits'] += entry['hits']
+                total['attempts'] += entry['attempts']
+        return combined
+
+    def ordered(self, domain: str, key: str, selector: str) -> List[str]:
+        """Альтернативы каскада: сначала успешные (с учетом текущего запуска), без истории - по порядку"""
+        alternatives = split_selector(selector)
+        history = self._history(domain, key)
+        current = self.run.get(domain, {}).get(key, {})
+
+        def score(indexed):
+            index, alternative = indexed
+            entry = history.get(alternative, {})
+            run_hits, run_attempts = current.get(alternative, (0, 0))
+            hits = entry.get('hits', 0) + run_hits
+            attempts = entry.get('attempts', 0) + run_attempts
+            # Сглаживание: альтернатива без истории получает 0.5
+            return (-(hits + 1) / (attempts + 2), index)
+
+        return [alternative for _, alternative in sorted(enumerate(alternatives), key=score)]
+
+    def should_probe(self, key: str) -> bool:
+        """Пора ли проверить все альтернативы ключа"""
+        self.queries[key] = self.queries.get(key, 0) + 1
+        return self.probe_every > 0 and self.queries[key] % self.probe_every == 1
+
+    def record(self, domain: str, key: str, alternative: str, hit: bool):
+        counters = self.run.setdefault(domain, {}).setdefault(key, {}).setdefault(alternative, [0, 0])
+        counters[0] += int(hit)
+        counters[1] += 1
+
+    def dead_selectors(self) -> List[Dict]:
+        """Альтернативы без единого попадания за dead_after попыток"""
+        if not self.loaded:
+            self.load()
+        dead = []
+        for domain, keys in sorted(self.totals.items()):
+            for key, alternatives in sorted(keys.items()):
+                for alternative, entry in alternatives.items():
+                    if entry['attempts'] >= self.dead_after and entry['hits'] == 0:
+                        dead.append({
+                            'domain': domain,
+                            'key': key,
+                            'selector': alternative,
+                            'attempts': entry['attempts'],
+                            'last_hit': entry.get('last_hit')
+                        })
+        return dead
+
+    def get_report(self) -> Dict:
+        """Сводка: доля попаданий альтернатив по доменам и мертвые селекторы"""
+        if not self.loaded:
+            self.load()
+        domains = {
+            domain: {
+                key: [
+                    {
+                        'selector': alternative,
+                        'hits': entry['hits'],
+                        'attempts': entry['attempts'],
+                        'hit_rate': round(entry['hits'] / entry['attempts'], 3) if entry['attempts'] else 0.0,
+                        'last_hit': entry.get('last_hit')
+                    }
+                    for alternative, entry in sorted(
+                        alternatives.items(), key=lambda item: -item[1]['hits'] / max(item[1]['attempts'], 1)
+                    )
+                ]
+                for key, alternatives in keys.items()
+            }
+            for domain, keys in self.totals.items()
+        }
+        return {'domains': domains, 'dead': self.dead_selectors(), 'runs': len(self.runs)}
+
+    def log_report(self):
+        """Вывод статистики запуска и мертвых селекторов в лог"""
+        for domain, keys in self.run.items():
+            for key, alternatives in keys.items():
+                rates = ', '.join(
+                    f"{alternative} {hits}/{attempts}" for alternative, (hits, attempts) in alternatives.items()
+                )
+                logger.info(f"Селекторы {domain} {key}: {rates}")
+        for item in self.dead_selectors():
+            logger.warning(
+                f"Селектор не срабатывает: {item['domain']} {item['key']} '{item['selector']}' "
+                f"(0 из {item['attempts']})"
+            )
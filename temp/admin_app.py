@@ -9,16 +9,17 @@ import json
 import os
 import subprocess
 import sys
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
+from urllib.parse import parse_qs
 
-import aiofiles
-from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi import BackgroundTasks, FastAPI, Request, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import uvicorn
 from pydantic import BaseModel
 
 # Добавляем путь к нашим модулям
@@ -26,13 +27,32 @@ sys.path.append('/app')
 
 try:
     from config import Config
-    from dzen_scraper import DzenNewsScraper
 except ImportError:
     print("Модули скрапера не найдены, создаем заглушки...")
     class Config:
-        OUTPUT_DIR = "./output"
-        LOGS_DIR = "./logs"
+        OUTPUT_DIR = os.getenv('OUTPUT_DIR', "./output")
+        LOGS_DIR = os.getenv('LOGS_DIR', "./logs")
         MAX_ARTICLES = 30
+        JOB_DB_PATH = os.getenv('JOB_DB_PATH', "./queue/jobs.db")
+        USE_JOB_QUEUE = os.getenv('USE_JOB_QUEUE', "true").lower() == "true"
+        SEARCH_DB_PATH = os.getenv('SEARCH_DB_PATH', "./queue/search.db")
+        PROFILES_DIR = os.getenv('PROFILES_DIR', "./profiles")
+        PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', "http://localhost:8000").rstrip('/')
+        FEEDS_BASE_URL = os.getenv('FEEDS_BASE_URL', "").rstrip('/')
+        WEBSUB_HUB_URL = os.getenv('WEBSUB_HUB_URL', f"{PUBLIC_BASE_URL}/websub")
+        WEBSUB_DB_PATH = os.getenv('WEBSUB_DB_PATH', "./queue/websub.db")
+        WEBSUB_CONCURRENCY = int(os.getenv('WEBSUB_CONCURRENCY', "10"))
+        SELECTOR_STATS_PATH = os.getenv('SELECTOR_STATS_PATH', "./state/selector_stats.json")
+
+from article_model import Article, count_articles
+from feed_publisher import (
+    MAIN_FEED_PATTERN, RESULTS_PATTERN, collect_recent_articles, render_rss, rubric_feed_pattern
+)
+from job_queue import JobQueue, PRIORITY_MANUAL, run_inline
+from search_index import ArticleSearchIndex
+from selector_stats import SelectorStats
+from profiling import list_profiles
+from websub_hub import WebSubHub
 
 # Инициализация FastAPI
 app = FastAPI(
@@ -41,16 +61,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Создание директорий для статики и шаблонов
-os.makedirs("static", exist_ok=True)
-os.makedirs("templates", exist_ok=True)
-os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
-os.makedirs(Config.LOGS_DIR, exist_ok=True)
-
-# Настройка статических файлов и шаблонов
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Настройка статических файлов и шаблонов; каталоги создаются при старте, а не при импорте
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
 templates = Jinja2Templates(directory="templates")
 
+@app.on_event("startup")
+async def create_directories():
+    """Создание директорий для статики, шаблонов, результатов и логов"""
+    for directory in ("static", "templates", Config.OUTPUT_DIR, Config.LOGS_DIR):
+        os.makedirs(directory, exist_ok=True)
+
 # Pydantic модели для API
 class ScraperConfig(BaseModel):
     max_articles: int = 30
@@ -64,14 +84,26 @@ class ManualRun(BaseModel):
     max_articles: int = 10
     save_format: str = "json"
 
-# Глобальные переменные
-scraper_status = {
-    "is_running": False,
-    "last_run": None,
-    "total_runs": 0,
-    "total_articles": 0,
-    "last_error": None
-}
+# Очередь задач: скрапинг выполняют отдельные процессы-воркеры (job_queue.py);
+# при USE_JOB_QUEUE=false ручные задачи выполняются здесь, по одной
+job_queue = JobQueue(Config.JOB_DB_PATH)
+inline_jobs_lock = asyncio.Lock()
+
+async def run_manual_jobs():
+    """Выполнение ручных задач без воркеров: в отдельном потоке со своим event loop"""
+    async with inline_jobs_lock:
+        try:
+            await asyncio.to_thread(asyncio.run, run_inline(job_queue, 'manual'))
+        except Exception as e:
+            print(f"Ошибка выполнения ручных задач: {e}")
+
+# Поисковый индекс по статьям; файлы, записанные без индексации, догоняются при поиске
+search_index = ArticleSearchIndex(Config.SEARCH_DB_PATH)
+SEARCH_SYNC_INTERVAL = 60
+# Индексация архива при старте; load_test.py отключает ее и индексирует данные до нагрузки
+SEARCH_SYNC_ON_STARTUP = os.getenv('SEARCH_SYNC_ON_STARTUP', "true").lower() == "true"
+search_sync_state = {"last_sync": 0.0}
+
 
 class AdminManager:
     """Менеджер администрирования"""
@@ -94,7 +126,7 @@ class AdminManager:
         try:
             # Статистика файлов результатов
             if self.output_dir.exists():
-                json_files = list(self.output_dir.glob("*.json"))
+                json_files = list(self.output_dir.glob(RESULTS_PATTERN))
                 stats["files_count"] = len(json_files)
                 
                 if json_files:
@@ -108,10 +140,8 @@ class AdminManager:
                     total_articles = 0
                     for file_path in json_files[-10:]:  # Последние 10 файлов
                         try:
-                            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                                content = await f.read()
-                                data = json.loads(content)
-                                total_articles += len(data) if isinstance(data, list) else 1
+                            # Подсчет без разбора статей: тексты в память не загружаются
+                            total_articles += await asyncio.to_thread(count_articles, file_path)
                         except:
                             continue
                     
@@ -150,7 +180,7 @@ class AdminManager:
         try:
             if self.output_dir.exists():
                 json_files = sorted(
-                    self.output_dir.glob("*.json"),
+                    self.output_dir.glob(RESULTS_PATTERN),
                     key=os.path.getctime,
                     reverse=True
                 )
@@ -161,10 +191,7 @@ class AdminManager:
                     # Подсчет статей в файле
                     article_count = 0
                     try:
-                        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                            content = await f.read()
-                            data = json.loads(content)
-                            article_count = len(data) if isinstance(data, list) else 1
+                        article_count = await asyncio.to_thread(count_articles, file_path)
                     except:
                         pass
                     
@@ -202,80 +229,23 @@ class AdminManager:
         except Exception as e:
             return f"Ошибка: {e}"
     
-    async def get_rss_feed(self, recent_hours: int = 24) -> str:
+    async def get_rss_feed(self, recent_hours: int = 24, rubric: Optional[str] = None) -> str:
         """Генерация RSS фида из последних новостей"""
         try:
-            # Находим файлы за последние часы
-            cutoff_time = datetime.now() - timedelta(hours=recent_hours)
-            recent_files = []
-            
-            if self.output_dir.exists():
-                for file_path in self.output_dir.glob("*.json"):
-                    if datetime.fromtimestamp(os.path.getctime(file_path)) > cutoff_time:
-                        recent_files.append(file_path)
-            
-            # Собираем статьи
-            all_articles = []
-            for file_path in sorted(recent_files, key=os.path.getctime, reverse=True):
-                try:
-                    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                        content = await f.read()
-                        data = json.loads(content)
-                        if isinstance(data, list):
-                            all_articles.extend(data)
-                except:
-                    continue
-            
-            # Ограничиваем количество статей
-            all_articles = all_articles[:50]
-            
-            # Генерируем RSS
-            rss_content = self.generate_rss_xml(all_articles)
-            return rss_content
+            # Тот же шаблон, что у статического фида main: без файлов рубрик
+            pattern = rubric_feed_pattern(rubric) if rubric else MAIN_FEED_PATTERN
+            # Статьи без полного текста: в фид он не попадает
+            all_articles = await asyncio.to_thread(
+                collect_recent_articles, self.output_dir, pattern, recent_hours, 50
+            )
+            return self.generate_rss_xml(all_articles, rss_topic_url(rubric))
         
         except Exception as e:
             return f"<error>Ошибка генерации RSS: {e}</error>"
     
-    def generate_rss_xml(self, articles: List[Dict]) -> str:
-        """Генерация RSS XML"""
-        from xml.sax.saxutils import escape
-        
-        rss_items = []
-        for article in articles:
-            title = escape(article.get('title', 'Без заголовка'))
-            url = escape(article.get('url', ''))
-            summary = escape(article.get('summary', '')[:200] + '...' if len(article.get('summary', '')) > 200 else article.get('summary', ''))
-            pub_date = article.get('scraped_at', datetime.now().isoformat())
-            
-            # Конвертируем дату в RFC-2822 формат
-            try:
-                dt = datetime.fromisoformat(pub_date.replace('Z', '+00:00'))
-                pub_date = dt.strftime('%a, %d %b %Y %H:%M:%S %z')
-            except:
-                pub_date = datetime.now().strftime('%a, %d %b %Y %H:%M:%S %z')
-            
-            rss_items.append(f"""
-    <item>
-        <title>{title}</title>
-        <link>{url}</link>
-        <description>{summary}</description>
-        <pubDate>{pub_date}</pubDate>
-        <guid>{url}</guid>
-    </item>""")
-        
-        rss_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0">
-    <channel>
-        <title>Dzen News Feed</title>
-        <description>Автоматически собранные новости с Dzen.ru</description>
-        <link>http://dzen.ru/news</link>
-        <language>ru-RU</language>
-        <lastBuildDate>{datetime.now().strftime('%a, %d %b %Y %H:%M:%S %z')}</lastBuildDate>
-        {''.join(rss_items)}
-    </channel>
-</rss>"""
-        
-        return rss_xml
+    def generate_rss_xml(self, articles: List[Article], self_url: str = '') -> str:
+        """Генерация RSS XML (тот же рендер, что и у статических фидов)"""
+        return render_rss(articles, hub_url=Config.WEBSUB_HUB_URL, self_url=self_url)
 
 # Создаем экземпляр менеджера
 admin = AdminManager()
@@ -291,7 +261,7 @@ async def dashboard(request: Request):
         "request": request,
         "stats": stats,
         "recent_files": recent_files,
-        "scraper_status": scraper_status
+        "scraper_status": await asyncio.to_thread(job_queue.get_summary)
     })
 
 @app.get("/api/stats")
@@ -342,6 +312,8 @@ async def files_page(request: Request):
 @app.get("/api/file/{filename}")
 async def get_file_content(filename: str):
     """API получения содержимого файла"""
+    import aiofiles
+
     try:
         file_path = admin.output_dir / filename
         if not file_path.exists():
@@ -363,46 +335,198 @@ async def get_file_content(filename: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/rss.xml")
-async def rss_feed(hours: int = 24):
-    """RSS фид последних новостей"""
-    rss_content = await admin.get_rss_feed(hours)
-    return HTMLResponse(content=rss_content, media_type="application/rss+xml")
+# Мониторинг задержек event loop (для нагрузочного тестирования)
+LOOP_LAG_INTERVAL = 0.05
+loop_lag_samples = deque(maxlen=2000)
 
-@app.post("/api/run-scraper")
-async def run_scraper_manually(config: ManualRun, background_tasks: BackgroundTasks):
-    """API ручного запуска скрапера"""
-    if scraper_status["is_running"]:
-        raise HTTPException(status_code=409, detail="Скрапер уже запущен")
-    
-    background_tasks.add_task(run_scraper_background, config)
-    return {"status": "started", "message": "Скрапер запущен в фоне"}
+async def monitor_loop_lag():
+    """Измерение запаздывания event loop относительно ожидаемого пробуждения"""
+    while True:
+        expected = time.perf_counter() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag_samples.append(max(time.perf_counter() - expected, 0.0))
 
-async def run_scraper_background(config: ManualRun):
-    """Фоновое выполнение скрапера"""
-    global scraper_status
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    """Запуск мониторинга event loop"""
+    asyncio.create_task(monitor_loop_lag())
+
+@app.get("/api/loop-lag")
+async def get_loop_lag(reset: bool = False):
+    """API статистики задержек event loop (мс)"""
+    samples = sorted(loop_lag_samples)
+    if reset:
+        loop_lag_samples.clear()
+    if not samples:
+        return {"samples": 0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
     
-    scraper_status["is_running"] = True
-    scraper_status["last_run"] = datetime.now().isoformat()
+    return {
+        "samples": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p99_ms": round(samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2)
+    }
+
+@app.on_event("startup")
+async def resume_manual_jobs():
+    """Без воркеров: возврат ручных задач, прерванных перезапуском, и их выполнение"""
+    if Config.USE_JOB_QUEUE:
+        return
+    await asyncio.to_thread(job_queue.requeue_orphaned, 'manual')
+    asyncio.create_task(run_manual_jobs())
+
+@app.on_event("startup")
+async def start_search_sync():
+    """Фоновая индексация архива при старте"""
+    search_sync_state["last_sync"] = asyncio.get_running_loop().time()
+    if not SEARCH_SYNC_ON_STARTUP:
+        return
+    asyncio.create_task(asyncio.to_thread(search_index.sync_directory, admin.output_dir))
+
+@app.get("/api/search")
+async def search_articles(q: str, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          limit: int = 20, offset: int = 0):
+    """API полнотекстового поиска по статьям (поддерживает "фразы" и префиксы*)"""
+    loop = asyncio.get_running_loop()
+    if loop.time() - search_sync_state["last_sync"] > SEARCH_SYNC_INTERVAL:
+        search_sync_state["last_sync"] = loop.time()
+        await asyncio.to_thread(search_index.sync_directory, admin.output_dir)
     
     try:
-        # Создаем экземпляр скрапера
-        scraper = DzenNewsScraper()
-        await scraper.run_scraper(
-            max_articles=config.max_articles,
-            save_format=config.save_format
+        return await asyncio.to_thread(
+            search_index.search, q, date_from, date_to, min(limit, 100), offset
         )
-        
-        scraper_status["total_runs"] += 1
-        scraper_status["total_articles"] += len(scraper.collected_articles)
-        scraper_status["last_error"] = None
-        
     except Exception as e:
-        scraper_status["last_error"] = str(e)
-        print(f"Ошибка выполнения скрапера: {e}")
+        raise HTTPException(status_code=400, detail=f"Ошибка поиска: {e}")
+
+@app.get("/api/selector-stats")
+async def get_selector_stats():
+    """API статистики селекторов: доля попаданий по доменам и мертвые селекторы"""
+    return await asyncio.to_thread(SelectorStats(Config.SELECTOR_STATS_PATH).get_report)
+
+@app.get("/api/profiles")
+async def get_profiles(limit: int = 50):
+    """API списка профилей запусков"""
+    return await asyncio.to_thread(list_profiles, Config.PROFILES_DIR, limit)
+
+@app.get("/api/profiles/{run_name}/{file_path:path}")
+async def get_profile_file(run_name: str, file_path: str):
+    """API скачивания файла профиля (cpu.prof, memory_top.txt, трассировки)"""
+    profiles_dir = Path(Config.PROFILES_DIR).resolve()
+    target = (profiles_dir / run_name / file_path).resolve()
+    if profiles_dir not in target.parents or not target.is_file():
+        raise HTTPException(status_code=404, detail="Файл профиля не найден")
+    return FileResponse(target, filename=target.name)
+
+@app.get("/profiles", response_class=HTMLResponse)
+async def profiles_page(request: Request):
+    """Страница профилей запусков"""
+    profiles = await asyncio.to_thread(list_profiles, Config.PROFILES_DIR)
+    return templates.TemplateResponse("profiles.html", {
+        "request": request,
+        "profiles": profiles
+    })
+
+@app.get("/rss.xml")
+async def rss_feed(hours: int = 24, rubric: Optional[str] = None):
+    """RSS фид последних новостей"""
+    if rubric and not rubric.replace('_', '').replace('-', '').isalnum():
+        raise HTTPException(status_code=400, detail="Некорректное имя рубрики")
     
-    finally:
-        scraper_status["is_running"] = False
+    rss_content = await admin.get_rss_feed(hours, rubric)
+    headers = {"Link": f'<{Config.WEBSUB_HUB_URL}>; rel="hub", <{rss_topic_url(rubric)}>; rel="self"'}
+    return HTMLResponse(content=rss_content, media_type="application/rss+xml", headers=headers)
+
+def rss_topic_url(rubric: Optional[str] = None) -> str:
+    """Публичный URL /rss.xml - топик WebSub"""
+    return f"{Config.PUBLIC_BASE_URL}/rss.xml" + (f"?rubric={rubric}" if rubric else "")
+
+# WebSub-хаб: подписчики получают новые элементы фидов вместо частого опроса /rss.xml
+websub_hub = WebSubHub(
+    Config.WEBSUB_DB_PATH,
+    hub_url=Config.WEBSUB_HUB_URL,
+    allowed_topic_prefixes=[prefix for prefix in (Config.PUBLIC_BASE_URL, Config.FEEDS_BASE_URL) if prefix],
+    concurrency=Config.WEBSUB_CONCURRENCY
+)
+
+@app.post("/websub")
+async def websub_endpoint(request: Request):
+    """WebSub-хаб: hub.mode = subscribe, unsubscribe или publish"""
+    params = parse_qs((await request.body()).decode('utf-8'))
+    def param(name: str) -> str:
+        return params.get(name, [''])[0]
+    
+    mode = param('hub.mode')
+    if mode in ('subscribe', 'unsubscribe'):
+        callback, topic = param('hub.callback'), param('hub.topic')
+        if not callback.startswith(('http://', 'https://')) or not topic:
+            raise HTTPException(status_code=400, detail="Нужны hub.callback и hub.topic")
+        if not websub_hub.topic_allowed(topic):
+            raise HTTPException(status_code=403, detail="Топик не обслуживается этим хабом")
+        try:
+            lease_seconds = int(param('hub.lease_seconds') or 0) or None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный hub.lease_seconds")
+        # Проверка намерения выполняется асинхронно, как требует спецификация
+        websub_hub.spawn(websub_hub.handle_subscription(mode, callback, topic, param('hub.secret'), lease_seconds))
+        return Response(status_code=202)
+    
+    if mode == 'publish':
+        topic = param('hub.url') or param('hub.topic')
+        if not websub_hub.topic_allowed(topic):
+            raise HTTPException(status_code=403, detail="Топик не обслуживается этим хабом")
+        websub_hub.spawn(websub_hub.publish(topic))
+        return Response(status_code=202)
+    
+    raise HTTPException(status_code=400, detail="Неизвестный hub.mode")
+
+@app.get("/api/websub/subscriptions")
+async def get_websub_subscriptions(topic: Optional[str] = None):
+    """API активных WebSub-подписок (без секретов)"""
+    subscriptions = await asyncio.to_thread(websub_hub.list_subscriptions, topic)
+    for subscription in subscriptions:
+        subscription['secret'] = bool(subscription['secret'])
+    return subscriptions
+
+@app.post("/api/run-scraper")
+async def run_scraper_manually(config: ManualRun, background_tasks: BackgroundTasks):
+    """API ручного запуска скрапера: задача ставится в очередь воркеров"""
+    job = await asyncio.to_thread(
+        job_queue.enqueue,
+        'scrape',
+        {"max_articles": config.max_articles, "save_format": config.save_format},
+        PRIORITY_MANUAL,
+        'manual'
+    )
+    if not Config.USE_JOB_QUEUE:
+        background_tasks.add_task(run_manual_jobs)
+    return {"status": "queued", "message": "Задача поставлена в очередь", "job": job}
+
+@app.get("/api/jobs")
+async def get_jobs(limit: int = 50, status: Optional[str] = None):
+    """API списка задач"""
+    return await asyncio.to_thread(job_queue.list_jobs, limit, status)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: int):
+    """API получения задачи с прогрессом"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    """API отмены задачи"""
+    job = await asyncio.to_thread(job_queue.request_cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+@app.get("/api/scraper-status")
+async def get_scraper_status():
+    """API сводки по очереди задач"""
+    return await asyncio.to_thread(job_queue.get_summary)
 
 @app.get("/config", response_class=HTMLResponse)
 async def config_page(request: Request):
@@ -424,6 +548,8 @@ async def config_page(request: Request):
 @app.post("/api/update-config")
 async def update_config(config: ScraperConfig):
     """API обновления конфигурации"""
+    import aiofiles
+
     try:
         # Обновляем .env файл
         env_lines = []
@@ -499,6 +625,8 @@ async def get_docker_status():
         return {"error": str(e)}
 
 if __name__ == "__main__":
+    import uvicorn
+
     # Создание шаблонов при первом запуске
     create_templates()
     create_static_files()
@@ -1,16 +1,40 @@
-rss = '''<?xml version="1.0" encoding="UTF-8" ?>
-<rss version="2.0">
-<channel>
-  <title>AINews RSS — Главное</title>
-  <link>https://dzen.ru/news</link>
-  <description>Главные новости России и мира. Автообновление GitHub Actions.</description>
-  <item>
-    <title>Автоматически обновляемый тестовый пост</title>
-    <link>https://example.com/test-news</link>
-    <pubDate>Mon, 08 Sep 2025 19:37:59 +0300</pubDate>
-    <description><![CDATA[Это автоматический тестовый пост.]]></description>
-  </item>
-</channel>
-</rss>'''
-with open('feed_main.xml', 'w', encoding='utf-8') as f:
-    f.write(rss)
+"""
+Публикация feed_main.xml для GitHub Actions
+Фид собирается из свежих результатов скрапера и перезаписывается только при изменении;
+результат передается в workflow через GITHUB_OUTPUT (changed=true/false).
+Скрапер в CI не запускается: файлы dzen_news_*.json должны быть в репозитории
+(каталог OUTPUT_DIR, по умолчанию ./output), их отправляет сервер со скрапером
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from feed_publisher import MAIN_FEED_PATTERN, FeedPublisher
+
+
+def main():
+    results_dir = Path(os.getenv('OUTPUT_DIR', './output'))
+    if not any(results_dir.glob(MAIN_FEED_PATTERN)):
+        # Предупреждение в интерфейсе GitHub Actions вместо тихого пропуска
+        print(f"::warning::Нет файлов результатов {MAIN_FEED_PATTERN} в {results_dir}: "
+              f"фид не обновлен, результаты скрапера нужно добавлять в репозиторий")
+
+    publisher = FeedPublisher(
+        publish_dir=os.getenv('FEEDS_DIR', '.'),
+        results_dir=str(results_dir),
+        recent_hours=int(os.getenv('FEED_RECENT_HOURS', '24'))
+    )
+    changed = publisher.publish_recent('main', MAIN_FEED_PATTERN, title='AINews RSS — Главное')
+    print("Фид обновлен" if changed else "Фид не изменился")
+
+    github_output = os.getenv('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a', encoding='utf-8') as f:
+            f.write(f"changed={'true' if changed else 'false'}\n")
+
+
+if __name__ == "__main__":
+    main()
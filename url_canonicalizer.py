@@ -0,0 +1,200 @@
+"""
+Канонические URL статей для Dzen News Scraper
+Строит ключ статьи без параметров отслеживания, раскрывает цепочки редиректов легкими
+HEAD/GET-запросами (через контекст браузера с его прокси и cookies, если он передан)
+и хранит результат, включая неудачи на короткий срок, в постоянном кэше
+"""
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+logger = logging.getLogger(__name__)
+
+# Метки отслеживания, которые удаляются на любом сайте
+TRACKING_PREFIXES = ('utm_', '_openstat')
+TRACKING_SUFFIXES = ('clid',)
+# Метки источника перехода Дзена: на других сайтах параметры с такими именами
+# могут определять страницу (story, from, t), поэтому удаляются только здесь
+DZEN_HOSTS = ('dzen.ru', 'ya.ru')
+DZEN_TRACKING_PARAMS = {
+    'lang', 'rubric', 'fan', 't', 'tt', 'persistent_id', 'story', 'from', 'rid', 'parent_rid',
+    'referrer', 'issue_tld', 'mid', 'stid', 'msid', 'sign', 'zen_source', 'feed_exp'
+}
+
+
+def is_dzen_host(netloc: str) -> bool:
+    host = netloc.lower().rsplit('@', 1)[-1].split(':', 1)[0]
+    return any(host == domain or host.endswith('.' + domain) for domain in DZEN_HOSTS)
+
+
+def is_tracking_param(key: str, dzen: bool = False) -> bool:
+    key = key.lower()
+    return (key.startswith(TRACKING_PREFIXES) or key.endswith(TRACKING_SUFFIXES)
+            or (dzen and key in DZEN_TRACKING_PARAMS))
+
+
+def strip_tracking_params(url: str) -> str:
+    """URL без параметров отслеживания и фрагмента, с упорядоченными параметрами
+
+    Используется как ключ для поиска дублей и guid в RSS; для перехода на страницу
+    сохраняется исходный адрес.
+    """
+    if not url:
+        return url
+    parsed = urlparse(url)
+    dzen = is_dzen_host(parsed.netloc)
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not is_tracking_param(key, dzen)
+    ]
+    return urlunparse((
+        parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or '/', parsed.params,
+        urlencode(sorted(query)), ''
+    ))
+
+
+class UrlCanonicalizer:
+    """Кэш адресов статей: исходная ссылка карточки -> адрес статьи после редиректов"""
+
+    def __init__(self, cache_path: str, max_age_days: float = 30.0, resolve_redirects: bool = True,
+                 concurrency: int = 8, timeout: float = 5.0, max_redirects: int = 10,
+                 user_agent: Optional[str] = None, failure_ttl_hours: float = 6.0):
+        self.cache_path = Path(cache_path)
+        self.max_age_days = max_age_days
+        # Неудачи (в том числе редирект на капчу) кэшируются ненадолго, чтобы
+        # каждый запуск не повторял те же запросы
+        self.failure_ttl_hours = failure_ttl_hours
+        self.resolve_redirects = resolve_redirects
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+
+        # Ключ исходного URL -> {'final_url': адрес после редиректов, 'resolved_at': время}
+        # или {'failed': True, 'resolved_at': время} для неудачных попыток
+        self.cache: Dict[str, Dict] = {}
+        self.loaded = False
+        self.stats = {'hits': 0, 'resolved': 0, 'redirected': 0, 'errors': 0, 'failed_hits': 0}
+
+    def load(self):
+        """Загрузка кэша с отбрасыванием устаревших записей"""
+        self.loaded = True
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+            return
+        now = time.time()
+        cutoff = now - self.max_age_days * 86400
+        failure_cutoff = now - self.failure_ttl_hours * 3600
+        # Записи прежнего формата (с адресом без параметров вместо конечного) отбрасываются
+        self.cache = {
+            key: entry for key, entry in cache.items()
+            if (entry.get('failed') or 'final_url' in entry)
+            and entry.get('resolved_at', 0) > (failure_cutoff if entry.get('failed') else cutoff)
+        }
+
+    def save(self):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш канонических URL: {e}")
+
+    def resolve(self, url: str) -> str:
+        """Раскрытие цепочки редиректов: HEAD, при отказе сервера - GET без чтения тела"""
+        import requests
+
+        headers = {'User-Agent': self.user_agent} if self.user_agent else {}
+        with requests.Session() as session:
+            session.max_redirects = self.max_redirects
+            response = session.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+            if response.status_code >= 400:
+                response = session.get(url, headers=headers, timeout=self.timeout,
+                                       allow_redirects=True, stream=True)
+                response.close()
+            response.raise_for_status()
+            # Страница проверки на робота - не адрес статьи
+            if 'captcha' in response.url:
+                raise ValueError(f"редирект на капчу: {response.url}")
+            return response.url
+
+    async def resolve_in_context(self, request, url: str) -> str:
+        """Раскрытие редиректов через APIRequestContext браузера: тот же прокси и cookies, что у страниц"""
+        timeout = self.timeout * 1000
+        response = await request.head(url, timeout=timeout, max_redirects=self.max_redirects)
+        if response.status >= 400:
+            await response.dispose()
+            response = await request.get(url, timeout=timeout, max_redirects=self.max_redirects)
+        try:
+            if response.status >= 400:
+                raise ValueError(f"HTTP {response.status}")
+            if 'captcha' in response.url:
+                raise ValueError(f"редирект на капчу: {response.url}")
+            return response.url
+        finally:
+            await response.dispose()
+
+    async def canonicalize(self, url: str, semaphore: Optional[asyncio.Semaphore] = None, request=None) -> str:
+        """Адрес статьи после редиректов для перехода; при ошибке - исходный URL
+
+        Параметры адреса сохраняются: ключ для дублей строится из него strip_tracking_params.
+        """
+        if not self.loaded:
+            self.load()
+
+        key = strip_tracking_params(url)
+        entry = self.cache.get(key)
+        if entry:
+            if entry.get('failed'):
+                self.stats['failed_hits'] += 1
+                return url
+            self.stats['hits'] += 1
+            return entry['final_url']
+        if not self.resolve_redirects:
+            return url
+
+        try:
+            async with semaphore or asyncio.Semaphore(1):
+                if request is not None:
+                    final_url = await self.resolve_in_context(request, url)
+                else:
+                    final_url = await asyncio.to_thread(self.resolve, url)
+        except Exception as e:
+            # Ошибка кэшируется на failure_ttl_hours: повторная попытка - в одном из следующих запусков
+            self.stats['errors'] += 1
+            self.cache[key] = {'failed': True, 'resolved_at': time.time()}
+            logger.debug(f"Не удалось раскрыть редиректы {url}: {e}")
+            return url
+
+        self.stats['resolved'] += 1
+        if strip_tracking_params(final_url) != key:
+            self.stats['redirected'] += 1
+        self.cache[key] = {'final_url': final_url, 'resolved_at': time.time()}
+        return final_url
+
+    async def canonicalize_many(self, urls: Iterable[str], request=None) -> Dict[str, str]:
+        """Адреса статей для набора ссылок с ограничением параллельных запросов
+
+        request - APIRequestContext контекста браузера; без него запросы идут напрямую через requests.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.canonicalize(url, semaphore, request) for url in urls))
+        return dict(zip(urls, results))
+
+    def log_stats(self):
+        """Вывод статистики кэша в лог"""
+        logger.info(
+            f"Канонические URL: из кэша {self.stats['hits']}, раскрыто {self.stats['resolved']} "
+            f"(с редиректом {self.stats['redirected']}), ошибок {self.stats['errors']}, "
+            f"пропущено после недавних ошибок {self.stats['failed_hits']}"
+        )
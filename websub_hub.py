@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+WebSub (PubSubHubbub) хаб для фидов Dzen News Scraper
+Подписки с проверкой намерения хранятся в SQLite; после публикации хаб
+забирает фид и рассылает подписчикам только новые элементы с подписью HMAC
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import closing
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+ET.register_namespace('atom', ATOM_NS)
+
+
+def build_delta(content: bytes, known_guids: Optional[List[str]]) -> Tuple[Optional[bytes], List[str]]:
+    """RSS только с новыми элементами и список guid текущего фида; None - новых элементов нет"""
+    root = ET.fromstring(content)
+    channel = root.find('channel')
+    if channel is None:
+        raise ValueError("в фиде нет channel")
+
+    guids = []
+    new_items = 0
+    for item in channel.findall('item'):
+        guid = (item.findtext('guid') or item.findtext('link') or '').strip()
+        guids.append(guid)
+        if known_guids is not None and guid in known_guids:
+            channel.remove(item)
+        else:
+            new_items += 1
+
+    if not new_items:
+        return None, guids
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True), guids
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Значение X-Hub-Signature"""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class WebSubHub:
+    """Легковесный WebSub-хаб: подписки, проверка намерения и рассылка изменений"""
+
+    def __init__(self, db_path: str, hub_url: str = '', allowed_topic_prefixes: Optional[List[str]] = None,
+                 default_lease: int = 10 * 86400, max_lease: int = 30 * 86400, concurrency: int = 10,
+                 timeout: float = 10.0, max_failures: int = 10):
+        self.db_path = Path(db_path)
+        self.hub_url = hub_url
+        self.allowed_topic_prefixes = allowed_topic_prefixes or []
+        self.default_lease = default_lease
+        self.max_lease = max_lease
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self._initialized = False
+        self._tasks = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    callback TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    secret TEXT NOT NULL DEFAULT '',
+                    expires_at REAL NOT NULL,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    delivered INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_delivery_at TEXT,
+                    PRIMARY KEY (callback, topic)
+                );
+                CREATE TABLE IF NOT EXISTS topics (
+                    topic TEXT PRIMARY KEY,
+                    guids TEXT NOT NULL,
+                    published_at TEXT NOT NULL
+                );
+            """)
+            self._initialized = True
+
+        return conn
+
+    def topic_allowed(self, topic: str) -> bool:
+        """Хаб обслуживает только собственные фиды: схема и хост совпадают точно, путь - по префиксу"""
+        try:
+            parsed = urlparse(topic)
+            parsed.port  # некорректный порт - ValueError
+        except ValueError:
+            return False
+        if parsed.scheme not in ('http', 'https') or '..' in parsed.path.split('/'):
+            return False
+
+        for prefix in self.allowed_topic_prefixes:
+            allowed = urlparse(prefix)
+            base_path = allowed.path.rstrip('/')
+            # Сравнение netloc целиком отсекает userinfo (host@other) и чужие поддомены (host.evil)
+            if (parsed.scheme == allowed.scheme and parsed.netloc.lower() == allowed.netloc.lower()
+                    and (parsed.path == base_path or parsed.path.startswith(base_path + '/'))):
+                return True
+        return False
+
+    def spawn(self, coro):
+        """Фоновая задача с удержанием ссылки до завершения"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Ошибка фоновой задачи хаба: {task.exception()}")
+
+    # Подписки
+
+    def verify_intent(self, mode: str, callback: str, topic: str, lease_seconds: int) -> bool:
+        """Проверка намерения: подписчик должен вернуть hub.challenge"""
+        import requests
+
+        challenge = secrets.token_urlsafe(24)
+        params = {'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge}
+        if mode == 'subscribe':
+            params['hub.lease_seconds'] = str(lease_seconds)
+        separator = '&' if urlparse(callback).query else '?'
+        try:
+            response = requests.get(callback + separator + urlencode(params), timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Проверка намерения {callback} не удалась: {e}")
+            return False
+        return 200 <= response.status_code < 300 and response.text.strip() == challenge
+
+    async def handle_subscription(self, mode: str, callback: str, topic: str, secret: str = '',
+                                  lease_seconds: Optional[int] = None) -> bool:
+        """Подписка или отписка после проверки намерения"""
+        lease = min(lease_seconds or self.default_lease, self.max_lease)
+        if not await asyncio.to_thread(self.verify_intent, mode, callback, topic, lease):
+            logger.info(f"Подписчик {callback} не подтвердил {mode} на {topic}")
+            return False
+
+        if mode == 'subscribe':
+            await asyncio.to_thread(self._save_subscription, callback, topic, secret, lease)
+            logger.info(f"Подписка {callback} на {topic} на {lease} с")
+        else:
+            await asyncio.to_thread(self._delete_subscription, callback, topic)
+            logger.info(f"Отписка {callback} от {topic}")
+        return True
+
+    def _save_subscription(self, callback: str, topic: str, secret: str, lease: int):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO subscriptions (callback, topic, secret, expires_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (callback, topic) DO UPDATE SET "
+                "secret = excluded.secret, expires_at = excluded.expires_at, failures = 0",
+                (callback, topic, secret, time.time() + lease, datetime.now().isoformat())
+            )
+
+    def _delete_subscription(self, callback: str, topic: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM subscriptions WHERE callback = ? AND topic = ?", (callback, topic))
+
+    def list_subscriptions(self, topic: Optional[str] = None) -> List[Dict]:
+        """Активные подписки (просроченные удаляются)"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM subscriptions WHERE expires_at < ?", (time.time(),))
+            if topic:
+                rows = conn.execute("SELECT * FROM subscriptions WHERE topic = ?", (topic,)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM subscriptions ORDER BY topic").fetchall()
+        return [dict(row) for row in rows]
+
+    # Публикация
+
+    def fetch_topic(self, topic: str) -> Tuple[bytes, str]:
+        import requests
+
+        response = requests.get(topic, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content, response.headers.get('Content-Type', 'application/rss+xml')
+
+    def _load_guids(self, topic: str) -> Optional[List[str]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT guids FROM topics WHERE topic = ?", (topic,)).fetchone()
+        return json.loads(row['guids']) if row else None
+
+    def _save_guids(self, topic: str, guids: List[str]):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO topics (topic, guids, published_at) VALUES (?, ?, ?)",
+                (topic, json.dumps(guids), datetime.now().isoformat())
+            )
+
+    def deliver(self, subscription: Dict, body: bytes, content_type: str) -> bool:
+        """Доставка изменений одному подписчику"""
+        import requests
+
+        headers = {
+            'Content-Type': content_type,
+            'Link': f'<{self.hub_url}>; rel="hub", <{subscription["topic"]}>; rel="self"'
+        }
+        if subscription['secret']:
+            headers['X-Hub-Signature'] = sign(subscription['secret'], body)
+        try:
+            response = requests.post(subscription['callback'], data=body, headers=headers, timeout=self.timeout)
+            ok = 200 <= response.status_code < 300
+        except requests.RequestException as e:
+            logger.debug(f"Доставка {subscription['callback']} не удалась: {e}")
+            ok = False
+
+        with closing(self._connect()) as conn, conn:
+            if ok:
+                conn.execute(
+                    "UPDATE subscriptions SET failures = 0, delivered = delivered + 1, last_delivery_at = ? "
+                    "WHERE callback = ? AND topic = ?",
+                    (datetime.now().isoformat(), subscription['callback'], subscription['topic'])
+                )
+            else:
+                conn.execute(
+                    "UPDATE subscriptions SET failures = failures + 1 WHERE callback = ? AND topic = ?",
+                    (subscription['callback'], subscription['topic'])
+                )
+                # Постоянно недоступные подписчики отключаются
+                conn.execute("DELETE FROM subscriptions WHERE failures >= ?", (self.max_failures,))
+        return ok
+
+    async def publish(self, topic: str) -> Dict:
+        """Рассылка новых элементов фида всем подписчикам с ограничением параллельности"""
+        content, content_type = await asyncio.to_thread(self.fetch_topic, topic)
+        known_guids = await asyncio.to_thread(self._load_guids, topic)
+        delta, guids = build_delta(content, known_guids)
+        await asyncio.to_thread(self._save_guids, topic, guids)
+
+        if delta is None:
+            logger.info(f"Новых элементов в {topic} нет, рассылка пропущена")
+            return {'topic': topic, 'subscribers': 0, 'delivered': 0}
+
+        subscriptions = await asyncio.to_thread(self.list_subscriptions, topic)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver_one(subscription: Dict) -> bool:
+            async with semaphore:
+                return await asyncio.to_thread(self.deliver, subscription, delta, content_type)
+
+        results = await asyncio.gather(*(deliver_one(subscription) for subscription in subscriptions))
+        logger.info(f"Рассылка {topic}: доставлено {sum(results)} из {len(subscriptions)}")
+        return {'topic': topic, 'subscribers': len(subscriptions), 'delivered': sum(results)}
+
+
+def ping_hub(hub_url: str, topics: List[str], timeout: float = 10.0) -> bool:
+    """Уведомление хаба об обновлении фидов (hub.mode=publish)"""
+    import requests
+
+    ok = True
+    for topic in topics:
+        try:
+            response = requests.post(hub_url, data={'hub.mode': 'publish', 'hub.url': topic}, timeout=timeout)
+            response.raise_for_status()
+            logger.info(f"Хаб {hub_url} уведомлен об обновлении {topic}")
+        except requests.RequestException as e:
+            logger.warning(f"Не удалось уведомить хаб {hub_url} о {topic}: {e}")
+            ok = False
+    return ok
+
+
+def run_subscriber(hub_url: str, topic: str, port: int, secret: str):
+    """Локальный подписчик для проверки хаба: подтверждает подписку и печатает доставки"""
+    import requests
+
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            challenge = query.get('hub.challenge', [''])[0]
+            print(f"Проверка намерения: {query.get('hub.mode', [''])[0]} {query.get('hub.topic', [''])[0]}")
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(challenge.encode('utf-8'))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            signature = self.headers.get('X-Hub-Signature', '')
+            valid = not secret or hmac.compare_digest(signature, sign(secret, body))
+            items = len(ET.fromstring(body).findall('channel/item')) if valid else 0
+            print(f"Доставка: {len(body)} байт, элементов {items}, подпись {'верна' if valid else 'НЕВЕРНА'}")
+            self.send_response(204 if valid else 403)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    callback = f'http://127.0.0.1:{server.server_port}/callback'
+
+    response = requests.post(hub_url, data={
+        'hub.mode': 'subscribe', 'hub.callback': callback, 'hub.topic': topic, 'hub.secret': secret
+    }, timeout=10)
+    print(f"Запрос подписки {callback}: HTTP {response.status_code}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def main():
+    """Утилиты WebSub: уведомление хаба и локальный подписчик для проверки"""
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="WebSub для фидов Dzen News Scraper")
+    parser.add_argument('command', choices=['ping', 'subscriber'])
+    parser.add_argument('--hub', default=Config.WEBSUB_HUB_URL, help="URL хаба")
+    parser.add_argument('--topic', default=f'{Config.PUBLIC_BASE_URL}/rss.xml', help="URL фида")
+    parser.add_argument('--port', type=int, default=0, help="Порт локального подписчика")
+    parser.add_argument('--secret', default='local-secret', help="Секрет подписи доставок")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'ping':
+        ping_hub(args.hub, [args.topic])
+    else:
+        run_subscriber(args.hub, args.topic, args.port, args.secret)
+
+
+if __name__ == "__main__":
+    main()